@@ -0,0 +1,85 @@
+"""Read/write helpers for processed artifacts in data/processed/.
+
+CSV is the default and stays the human-facing format. Set PIPELINE_ARTIFACT_FORMAT
+to choose what the phases write:
+- csv (default): CSV only.
+- both: CSV plus an uncompressed Arrow IPC (Feather v2) copy next to it.
+- arrow: Arrow IPC only.
+
+When an Arrow copy exists and the format is not `csv`, downstream phases
+memory-map it instead of re-parsing the CSV, so dtypes (including `month` as a
+datetime) come back as written. Non-csv formats require pyarrow. Writing in `csv`
+format removes any Arrow copy left by an earlier run, and readers skip an Arrow
+copy older than its CSV, so a stale copy is never read.
+
+Artifacts are always addressed by their `.csv` path; the Arrow copy lives at the
+same path with an `.arrow` suffix.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+FORMATS = ("csv", "both", "arrow")
+DATE_COLUMNS = ("month",)
+
+
+def artifact_format() -> str:
+    fmt = os.environ.get("PIPELINE_ARTIFACT_FORMAT", "csv").lower()
+    if fmt not in FORMATS:
+        raise SystemExit(f"PIPELINE_ARTIFACT_FORMAT must be one of {FORMATS}, got {fmt!r}")
+    return fmt
+
+
+def arrow_path(path: Path) -> Path:
+    return path.with_suffix(".arrow")
+
+
+def _feather():
+    try:
+        import pyarrow.feather as feather
+    except ImportError as e:
+        raise SystemExit("PIPELINE_ARTIFACT_FORMAT=both|arrow requires pyarrow (pip install pyarrow)") from e
+    return feather
+
+
+def arrow_is_current(path: Path) -> bool:
+    """True if the Arrow copy exists and is at least as new as the CSV (or there is no CSV)."""
+    arrow = arrow_path(path)
+    return arrow.exists() and (not path.exists() or arrow.stat().st_mtime >= path.stat().st_mtime)
+
+
+def write_table(df: pd.DataFrame, path: Path) -> None:
+    """Write a processed table in the configured format(s)."""
+    fmt = artifact_format()
+    if fmt in ("csv", "both"):
+        df.to_csv(path, index=False)
+    if fmt == "csv":
+        arrow_path(path).unlink(missing_ok=True)
+    if fmt in ("both", "arrow"):
+        # Uncompressed so readers can memory-map the buffers without decoding.
+        _feather().write_feather(df.reset_index(drop=True), arrow_path(path), compression="uncompressed")
+
+
+def read_table(path: Path) -> pd.DataFrame:
+    """Read a processed table, memory-mapping the Arrow copy when enabled and present."""
+    if artifact_format() != "csv" and arrow_is_current(path):
+        return _feather().read_table(arrow_path(path), memory_map=True).to_pandas()
+
+    df = pd.read_csv(path)
+    for c in DATE_COLUMNS:
+        if c in df.columns:
+            df[c] = pd.to_datetime(df[c], errors="coerce")
+    return df
+
+
+def table_exists(path: Path) -> bool:
+    return path.exists() or arrow_path(path).exists()
+
+
+def table_mtime(path: Path) -> float:
+    """Latest modification time of the table's CSV or Arrow copy (0.0 if neither exists)."""
+    return max((p.stat().st_mtime for p in (path, arrow_path(path)) if p.exists()), default=0.0)
@@ -0,0 +1,292 @@
+"""Tolerance-aware diff of the processed outputs of two pipeline runs.
+
+Takes a golden and a candidate output root (or their data/processed directories)
+and compares every processed table present in either. Rows are aligned on the
+table's key columns (month, account_id, plan_tier, tenure_bucket and the other
+natural keys in KEY_COLUMNS); tables without unique keys are compared by
+position. Numeric columns match when |a - b| <= atol + rtol * |b| (NaN equals
+NaN); all other columns must be equal. Columns are compared in row chunks, so
+temporary memory stays bounded on large tables. Arrow copies are memory-mapped
+when present and at least as new as the CSV (a later csv-format run leaves a
+stale copy behind); otherwise CSVs are parsed with the pyarrow engine if available.
+
+Besides per-table mismatch counts, the report flags:
+- months whose leader_pressure_3m changed in phase3_driver_comparison, and
+- a change in the phase 4 recommendation (mode and driver, recomputed from both
+  comparison tables with the same rule) and whether analysis_recommendation.md differs.
+
+Exit status is 1 when anything differs, so the tool can gate CI.
+
+Usage:
+- python scripts/compare_outputs.py /runs/golden /runs/candidate
+- python scripts/compare_outputs.py golden/ candidate/ --rtol 1e-6 --atol 1e-9 --report diff_report.csv
+- python scripts/compare_outputs.py full/ windowed/ --start-month 2025-01 --end-month 2025-12
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from artifacts import DATE_COLUMNS, arrow_path
+from phase4_recommendation import backtest
+
+# Alignment keys, in sort order; each table uses the ones it has.
+KEY_COLUMNS = [
+    "tenant",
+    "month",
+    "account_id",
+    "plan_tier",
+    "tenure_bucket",
+    "referral_source",
+    "scenario",
+    "table",
+    "check",
+    "column",
+    "source_line",
+]
+
+DEFAULT_RTOL = 1e-9
+DEFAULT_ATOL = 1e-9
+CHUNK_ROWS = 1_000_000
+
+# Rows listed per table in the printed report.
+MAX_EXAMPLES = 5
+
+
+def processed_dir(root: Path) -> Path:
+    proc = root / "data" / "processed"
+    return proc if proc.is_dir() else root
+
+
+def table_names(proc: Path) -> set[str]:
+    """Table names addressed by their .csv path, whether stored as CSV, Arrow or both."""
+    return {p.with_suffix(".csv").name for p in proc.iterdir() if p.suffix in (".csv", ".arrow")}
+
+
+def _arrow_is_current(path: Path) -> bool:
+    arrow = arrow_path(path)
+    return arrow.exists() and (not path.exists() or arrow.stat().st_mtime >= path.stat().st_mtime)
+
+
+def load(path: Path) -> pd.DataFrame:
+    if _arrow_is_current(path):
+        try:
+            import pyarrow.feather as feather
+        except ImportError:
+            pass
+        else:
+            return feather.read_table(arrow_path(path), memory_map=True).to_pandas()
+    try:
+        df = pd.read_csv(path, engine="pyarrow")
+    except ImportError:
+        df = pd.read_csv(path)
+    for c in DATE_COLUMNS:
+        if c in df.columns:
+            df[c] = pd.to_datetime(df[c], errors="coerce")
+    return df
+
+
+def _keys(a: pd.DataFrame, b: pd.DataFrame) -> list[str]:
+    keys = [k for k in KEY_COLUMNS if k in a.columns and k in b.columns]
+    if keys and not a.duplicated(keys).any() and not b.duplicated(keys).any():
+        return keys
+    return []
+
+
+def align(a: pd.DataFrame, b: pd.DataFrame, keys: list[str]) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Rows of a and b matched on keys (same order), plus the keys only in a and only in b."""
+    if not keys:
+        n = min(len(a), len(b))
+        return a.iloc[:n].reset_index(drop=True), b.iloc[:n].reset_index(drop=True), a.iloc[n:], b.iloc[n:]
+
+    a = a.sort_values(keys, kind="stable").reset_index(drop=True)
+    b = b.sort_values(keys, kind="stable").reset_index(drop=True)
+    if len(a) == len(b) and all(_equal(a[k], b[k]).all() for k in keys):
+        return a, b, a.iloc[:0], b.iloc[:0]
+
+    # Key sets differ: outer-join the keys only, then take the matched rows.
+    ka = a[keys].assign(_ia=np.arange(len(a)))
+    kb = b[keys].assign(_ib=np.arange(len(b)))
+    m = ka.merge(kb, on=keys, how="outer", sort=True)
+    both = m["_ia"].notna() & m["_ib"].notna()
+    ia = m.loc[both, "_ia"].astype("int64").to_numpy()
+    ib = m.loc[both, "_ib"].astype("int64").to_numpy()
+    only_a = m.loc[m["_ib"].isna(), keys]
+    only_b = m.loc[m["_ia"].isna(), keys]
+    return a.iloc[ia].reset_index(drop=True), b.iloc[ib].reset_index(drop=True), only_a, only_b
+
+
+def _equal(x: pd.Series, y: pd.Series, rtol: float = 0.0, atol: float = 0.0) -> np.ndarray:
+    """Element-wise match with NaN == NaN; numeric pairs use the tolerances."""
+    if pd.api.types.is_numeric_dtype(x) and pd.api.types.is_numeric_dtype(y) and not (
+        pd.api.types.is_bool_dtype(x) or pd.api.types.is_bool_dtype(y)
+    ):
+        xv = x.to_numpy(dtype="float64", na_value=np.nan)
+        yv = y.to_numpy(dtype="float64", na_value=np.nan)
+        return np.isclose(xv, yv, rtol=rtol, atol=atol, equal_nan=True)
+    xs, ys = x.astype(object), y.astype(object)
+    return ((xs == ys) | (xs.isna() & ys.isna())).to_numpy(dtype=bool)
+
+
+def compare_column(x: pd.Series, y: pd.Series, rtol: float, atol: float) -> tuple[np.ndarray, float]:
+    """Mismatching row positions and the largest absolute numeric difference."""
+    bad, max_abs = [], 0.0
+    numeric = pd.api.types.is_numeric_dtype(x) and pd.api.types.is_numeric_dtype(y)
+    for lo in range(0, len(x), CHUNK_ROWS):
+        xc, yc = x.iloc[lo:lo + CHUNK_ROWS], y.iloc[lo:lo + CHUNK_ROWS]
+        ok = _equal(xc, yc, rtol, atol)
+        bad.append(np.flatnonzero(~ok) + lo)
+        if numeric and not ok.all():
+            diff = np.abs(xc.to_numpy(dtype="float64", na_value=np.nan) - yc.to_numpy(dtype="float64", na_value=np.nan))
+            max_abs = max(max_abs, float(np.nanmax(diff, initial=0.0)))
+    return (np.concatenate(bad) if bad else np.array([], dtype=np.int64)), max_abs
+
+
+def compare_table(a: pd.DataFrame, b: pd.DataFrame, rtol: float, atol: float) -> dict:
+    keys = _keys(a, b)
+    xa, xb, only_a, only_b = align(a, b, keys)
+
+    cols = [c for c in a.columns if c in b.columns and c not in keys]
+    mismatches: dict[str, int] = {}
+    max_abs = 0.0
+    examples = []
+    for c in cols:
+        bad, col_max = compare_column(xa[c], xb[c], rtol, atol)
+        if len(bad):
+            mismatches[c] = len(bad)
+            max_abs = max(max_abs, col_max)
+            if keys:
+                # Keys can be NaN (e.g. ingest_quarantine); astype(str) on object columns keeps it as float.
+                label = xa.loc[bad[:MAX_EXAMPLES], keys].astype(object).fillna("<NA>").astype(str).agg(" ".join, axis=1)
+            else:
+                label = pd.Series(bad[:MAX_EXAMPLES]).astype(str)
+            examples += [f"{c} @ {k}: {va!r} -> {vb!r}" for k, va, vb in zip(label, xa[c].iloc[bad[:MAX_EXAMPLES]], xb[c].iloc[bad[:MAX_EXAMPLES]])]
+
+    return {
+        "keys": ",".join(keys) if keys else "(position)",
+        "golden_rows": len(a),
+        "candidate_rows": len(b),
+        "only_golden": len(only_a),
+        "only_candidate": len(only_b),
+        "columns_only_golden": ",".join(c for c in a.columns if c not in b.columns),
+        "columns_only_candidate": ",".join(c for c in b.columns if c not in a.columns),
+        "mismatched_cells": sum(mismatches.values()),
+        "mismatched_columns": ",".join(f"{c}({n})" for c, n in mismatches.items()),
+        "max_abs_diff": max_abs,
+        "examples": examples,
+    }
+
+
+def recommendation_changes(golden: pd.DataFrame, candidate: pd.DataFrame) -> list[str]:
+    """leader_pressure_3m changes by month and the latest verdict under the phase 4 rule."""
+    notes = []
+    m = golden[["month", "leader_pressure_3m"]].merge(
+        candidate[["month", "leader_pressure_3m"]], on="month", suffixes=("_golden", "_candidate")
+    )
+    changed = m.loc[~_equal(m["leader_pressure_3m_golden"], m["leader_pressure_3m_candidate"])]
+    for r in changed.itertuples(index=False):
+        notes.append(f"leader_pressure_3m {r.month:%Y-%m}: {r.leader_pressure_3m_golden} -> {r.leader_pressure_3m_candidate}")
+
+    verdicts = []
+    for comp in (golden, candidate):
+        bt = backtest(comp)
+        led = bt.loc[bt["leader_pressure_3m"].notna()]
+        if led.empty:
+            verdicts.append("n/a")
+        else:
+            last = led.iloc[-1]
+            driver = last["recommendation_driver"] if pd.notna(last["recommendation_driver"]) else "-"
+            verdicts.append(f"{last['recommendation_mode']}:{driver}")
+    if verdicts[0] != verdicts[1]:
+        notes.append(f"recommendation changed: {verdicts[0]} -> {verdicts[1]}")
+    return notes
+
+
+def _clip(df: pd.DataFrame, start: pd.Timestamp | None, end: pd.Timestamp | None) -> pd.DataFrame:
+    if "month" not in df.columns or (start is None and end is None):
+        return df
+    keep = pd.Series(True, index=df.index)
+    if start is not None:
+        keep &= df["month"] >= start
+    if end is not None:
+        keep &= df["month"] <= end
+    return df.loc[keep]
+
+
+def compare_roots(
+    golden: Path,
+    candidate: Path,
+    rtol: float = DEFAULT_RTOL,
+    atol: float = DEFAULT_ATOL,
+    start: pd.Timestamp | None = None,
+    end: pd.Timestamp | None = None,
+) -> tuple[pd.DataFrame, list[str]]:
+    """Per-table report rows and notable changes (printable lines); start/end limit month-keyed rows."""
+    pg, pc = processed_dir(golden), processed_dir(candidate)
+    names_g, names_c = table_names(pg), table_names(pc)
+
+    rows, notes = [], []
+    for name in sorted(names_g | names_c):
+        if name not in names_c or name not in names_g:
+            rows.append({"table": name, "status": "missing_in_" + ("candidate" if name not in names_c else "golden")})
+            continue
+        a, b = _clip(load(pg / name), start, end), _clip(load(pc / name), start, end)
+        res = compare_table(a, b, rtol, atol)
+        differs = res["mismatched_cells"] or res["only_golden"] or res["only_candidate"] or res["columns_only_golden"] or res["columns_only_candidate"]
+        notes += [f"{name}: {e}" for e in res.pop("examples")]
+        rows.append({"table": name, "status": "differs" if differs else "equal", **res})
+
+        if name == "phase3_driver_comparison.csv":
+            notes += recommendation_changes(a, b)
+
+    md = [root / "analysis_recommendation.md" for root in (golden, candidate)]
+    if all(p.exists() for p in md):
+        same = md[0].read_bytes() == md[1].read_bytes()
+        rows.append({"table": "analysis_recommendation.md", "status": "equal" if same else "differs"})
+
+    return pd.DataFrame(rows), notes
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("golden", type=Path, help="Golden output root (or its data/processed directory).")
+    ap.add_argument("candidate", type=Path, help="Candidate output root (or its data/processed directory).")
+    ap.add_argument("--rtol", type=float, default=DEFAULT_RTOL, help="Relative tolerance for numeric columns.")
+    ap.add_argument("--atol", type=float, default=DEFAULT_ATOL, help="Absolute tolerance for numeric columns.")
+    ap.add_argument("--start-month", help="Only compare rows from this month on (tables with a month column), e.g. 2024-01.")
+    ap.add_argument("--end-month", help="Only compare rows up to this month (tables with a month column).")
+    ap.add_argument("--report", type=Path, help="Also write the per-table report as CSV.")
+    args = ap.parse_args()
+
+    for root in (args.golden, args.candidate):
+        if not processed_dir(root).is_dir():
+            raise SystemExit(f"Not a directory: {root}")
+
+    start = pd.Timestamp(args.start_month) if args.start_month else None
+    end = pd.Timestamp(args.end_month) if args.end_month else None
+    report, notes = compare_roots(args.golden, args.candidate, args.rtol, args.atol, start, end)
+    if report.empty:
+        raise SystemExit("No processed tables found in either root")
+    if args.report:
+        report.to_csv(args.report, index=False)
+
+    counts = ["golden_rows", "candidate_rows", "only_golden", "only_candidate", "mismatched_cells"]
+    for c in counts:
+        if c in report:
+            report[c] = report[c].astype("Int64")
+    cols = [c for c in ["table", "status", "keys", *counts, "max_abs_diff"] if c in report]
+    print(report[cols].to_string(index=False))
+    for n in notes:
+        print("-", n)
+
+    differs = int((report["status"] != "equal").sum())
+    print(f"\n{differs} of {len(report)} outputs differ (rtol={args.rtol:g}, atol={args.atol:g})")
+    return 1 if differs else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,21 +5,39 @@ Dataset:
 
 Policy:
 - Raw data is not committed by default.
-- Requires Kaggle CLI configured via ~/.kaggle/kaggle.json
+- Requires Kaggle CLI configured via ~/.kaggle/kaggle.json (default source)
+
+Sources:
+- kaggle (default): Kaggle CLI download with --unzip.
+- mirror: a local directory or an http(s):// base URL holding the EXPECTED_FILES,
+  each either plain (`name.csv`) or gzip-compressed (`name.csv.gz`). Use this for
+  internal exports or a local stand-in server.
+
+Mirror fetches run concurrently, resume from a `.part` file with HTTP Range
+requests, and decompress + hash while streaming, so each byte is read once.
 
 Usage:
 - python scripts/download_data.py
+- python scripts/download_data.py --mirror /path/to/export
+- python scripts/download_data.py --mirror https://mirror.example.com/ravenstack
+- RAVENSTACK_MIRROR=http://localhost:8000 python scripts/download_data.py
 """
 
 from __future__ import annotations
 
+import argparse
 import hashlib
+import os
 import pathlib
 import subprocess
+import urllib.error
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
-ROOT = pathlib.Path(__file__).resolve().parents[1]
-RAW_DIR = ROOT / "data" / "raw" / "ravenstack"
-HASHES_FILE = ROOT / "data" / "hashes.sha256"
+from paths import HASHES_FILE, RAW, ROOT
+
+RAW_DIR = RAW
 
 DATASET_REF = "rivalytics/saas-subscription-and-churn-analytics-dataset"
 EXPECTED_FILES = [
@@ -30,17 +48,23 @@ EXPECTED_FILES = [
     "ravenstack_support_tickets.csv",
 ]
 
+CHUNK_SIZE = 1024 * 1024
+
 
 def sha256_file(path: pathlib.Path) -> str:
     h = hashlib.sha256()
     with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
             h.update(chunk)
     return h.hexdigest()
 
 
-def write_hashes(files: list[pathlib.Path]) -> None:
-    lines = [f"{sha256_file(p)}  {p.relative_to(ROOT)}" for p in files]
+def write_hashes(files: list[pathlib.Path], known: dict[pathlib.Path, str] | None = None) -> None:
+    """Write hashes for `files`, reusing digests already computed while streaming."""
+    known = known or {}
+    # Paths are repo-relative when the raw dir lives in the repo, absolute otherwise.
+    lines = [f"{known.get(p) or sha256_file(p)}  {p.relative_to(ROOT) if p.is_relative_to(ROOT) else p}" for p in files]
+    HASHES_FILE.parent.mkdir(parents=True, exist_ok=True)
     HASHES_FILE.write_text("\n".join(lines) + "\n", encoding="utf-8")
 
 
@@ -48,25 +72,153 @@ def have_expected_files() -> bool:
     return all((RAW_DIR / f).exists() for f in EXPECTED_FILES)
 
 
+def _is_http(mirror: str) -> bool:
+    return mirror.startswith(("http://", "https://"))
+
+
+def _mirror_exists(mirror: str, name: str) -> bool:
+    if not _is_http(mirror):
+        return (pathlib.Path(mirror) / name).is_file()
+    req = urllib.request.Request(f"{mirror.rstrip('/')}/{name}", method="HEAD")
+    try:
+        with urllib.request.urlopen(req):
+            return True
+    except urllib.error.HTTPError:
+        return False
+
+
+def _open_source(mirror: str, name: str, offset: int):
+    """Open `name` on the mirror at byte `offset`. Returns (stream, resumed)."""
+    if not _is_http(mirror):
+        f = (pathlib.Path(mirror) / name).open("rb")
+        f.seek(offset)
+        return f, True
+
+    req = urllib.request.Request(f"{mirror.rstrip('/')}/{name}")
+    if offset:
+        req.add_header("Range", f"bytes={offset}-")
+    try:
+        resp = urllib.request.urlopen(req)
+    except urllib.error.HTTPError as e:
+        # 416: the partial file is already complete (or stale); start over.
+        if e.code != 416:
+            raise
+        resp, _ = _open_source(mirror, name, 0)
+        return resp, False
+    # A server that ignores Range answers 200 with the full body.
+    return resp, offset == 0 or resp.status == 206
+
+
+def fetch_from_mirror(mirror: str, name: str, dest_dir: pathlib.Path) -> tuple[pathlib.Path, str]:
+    """Fetch one file from the mirror into dest_dir; returns (path, sha256 of the CSV).
+
+    Transferred bytes are kept in a `.part` file until complete so an interrupted
+    fetch resumes where it stopped. Gzip sources are decompressed and hashed in the
+    same pass as the transfer.
+    """
+    gz = not _mirror_exists(mirror, name) and _mirror_exists(mirror, name + ".gz")
+    src_name = name + ".gz" if gz else name
+    dest = dest_dir / name
+    part = dest_dir / (src_name + ".part")
+    tmp = dest_dir / (name + ".tmp")
+
+    def reset():
+        return hashlib.sha256(), (zlib.decompressobj(wbits=16 + zlib.MAX_WBITS) if gz else None)
+
+    h, decomp = reset()
+    out = tmp.open("wb") if gz else None
+
+    def consume(chunk: bytes) -> None:
+        data = decomp.decompress(chunk) if decomp else chunk
+        h.update(data)
+        if out:
+            out.write(data)
+
+    offset = part.stat().st_size if part.exists() else 0
+    # Replay what is already on disk so the digest (and decompressor) cover it.
+    if offset:
+        with part.open("rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                consume(chunk)
+
+    src, resumed = _open_source(mirror, src_name, offset)
+    if not resumed:
+        h, decomp = reset()
+        if out:
+            out.seek(0)
+            out.truncate()
+        offset = 0
+
+    try:
+        with src, part.open("ab" if offset else "wb") as p:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                p.write(chunk)
+                consume(chunk)
+        if decomp:
+            tail = decomp.flush()
+            h.update(tail)
+            out.write(tail)
+    finally:
+        if out:
+            out.close()
+
+    if gz:
+        os.replace(tmp, dest)
+        part.unlink()
+    else:
+        os.replace(part, dest)
+    return dest, h.hexdigest()
+
+
+def download_from_mirror(mirror: str, refresh: bool = False) -> dict[pathlib.Path, str]:
+    """Fetch missing EXPECTED_FILES from the mirror concurrently."""
+    todo = [f for f in EXPECTED_FILES if refresh or not (RAW_DIR / f).exists()]
+    if not todo:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(todo)) as pool:
+        results = pool.map(lambda f: fetch_from_mirror(mirror, f, RAW_DIR), todo)
+        return dict(results)
+
+
+def download_from_kaggle() -> None:
+    subprocess.check_call(
+        [
+            "kaggle",
+            "datasets",
+            "download",
+            "-d",
+            DATASET_REF,
+            "-p",
+            str(RAW_DIR),
+            "--unzip",
+        ]
+    )
+
+
 def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--mirror",
+        default=os.environ.get("RAVENSTACK_MIRROR"),
+        help="Local directory or http(s) base URL to fetch from instead of Kaggle (env: RAVENSTACK_MIRROR).",
+    )
+    ap.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Re-fetch files from the mirror even if they already exist locally.",
+    )
+    args = ap.parse_args()
+
     RAW_DIR.mkdir(parents=True, exist_ok=True)
 
-    if not have_expected_files():
-        subprocess.check_call(
-            [
-                "kaggle",
-                "datasets",
-                "download",
-                "-d",
-                DATASET_REF,
-                "-p",
-                str(RAW_DIR),
-                "--unzip",
-            ]
-        )
+    known: dict[pathlib.Path, str] = {}
+    if args.mirror:
+        known = download_from_mirror(args.mirror, refresh=args.refresh)
+    elif not have_expected_files():
+        download_from_kaggle()
 
     files = sorted([p for p in RAW_DIR.glob("*.csv") if p.is_file()])
-    write_hashes(files)
+    write_hashes(files, known)
 
     print(f"Dataset ready in: {RAW_DIR}")
     print(f"Hashes written to: {HASHES_FILE}")
@@ -0,0 +1,339 @@
+"""Raw table loading and ingest validation with a quarantine of rejected rows.
+
+Every phase loads raw exports through read_raw(), which parses dates the way the
+phases always have (unparseable values become NaT). Phase 1 loads every table
+through load_validated(), which checks all rules in one vectorized pass over the
+frames it has just parsed (no second read) and writes:
+- data/processed/ingest_quarantine.csv: each rejected row with its source line and
+  reason codes (";"-separated), followed by the raw columns.
+- data/processed/ingest_dq_summary.csv: rows, quarantined rows and rows per reason
+  code for every table.
+
+Reason codes:
+- accounts: MISSING_ACCOUNT_ID, DUPLICATE_ACCOUNT_ID, BAD_SIGNUP_DATE.
+- subscriptions: MISSING_ACCOUNT_ID, UNKNOWN_ACCOUNT, DUPLICATE_SUBSCRIPTION_ID,
+  BAD_START_DATE, BAD_END_DATE, END_BEFORE_START, MISSING_MRR, NEGATIVE_MRR,
+  OVERLAPPING_SAME_TIER (starts before an earlier subscription of the same account
+  and tier has ended; the earlier row is kept).
+- churn_events: MISSING_ACCOUNT_ID, UNKNOWN_ACCOUNT, DUPLICATE_CHURN_EVENT_ID, BAD_CHURN_DATE.
+
+With a month window (see window.py) only the rows loaded for that window are
+checked. Missing and unparseable dates share a code: the phases drop those rows either way.
+By default the phases keep their existing row handling and this report makes it
+visible. Set PIPELINE_STRICT_INGEST=1 (run_all.py --strict-ingest) to drop every
+quarantined row when the phases load raw data.
+
+Strict mode re-checks each table a phase loads; the known account ids are read
+once per process.
+
+Usage (standalone report, same output as phase 1 writes):
+- python scripts/ingest.py
+"""
+
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from artifacts import write_table
+from paths import PROC, RAW
+from window import month_window, window_active
+
+STRICT_ENV = "PIPELINE_STRICT_INGEST"
+
+RAW_FILES = {
+    "accounts": "ravenstack_accounts.csv",
+    "subscriptions": "ravenstack_subscriptions.csv",
+    "churn_events": "ravenstack_churn_events.csv",
+}
+
+DATE_COLUMNS = {
+    "accounts": ["signup_date"],
+    "subscriptions": ["start_date", "end_date"],
+    "churn_events": ["churn_date"],
+}
+
+# Rows per read_csv chunk when a month window is pushed down into loading.
+CHUNK_ROWS = 500_000
+
+QUARANTINE_PATH = PROC / "ingest_quarantine.csv"
+SUMMARY_PATH = PROC / "ingest_dq_summary.csv"
+
+
+def strict_enabled() -> bool:
+    return os.environ.get(STRICT_ENV, "").lower() in ("1", "true", "yes")
+
+
+def _parse(table: str, df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, pd.Series]]:
+    """Parse date columns in place; also return which values were present before parsing."""
+    present = {}
+    for col in DATE_COLUMNS[table]:
+        present[col] = df[col].notna()
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df, present
+
+
+def _pushdown(table: str, df: pd.DataFrame) -> pd.Series:
+    """Rows that can affect months inside the window (rows with missing dates are kept)."""
+    first, end = month_window()
+    after = end + pd.offsets.MonthBegin(1) if end is not None else None
+    keep = pd.Series(True, index=df.index)
+    if table == "subscriptions":
+        if first is not None:
+            keep &= ~(df["end_date"] < first)
+        if after is not None:
+            keep &= ~(df["start_date"] >= after)
+    elif after is not None:
+        keep &= ~(df[DATE_COLUMNS[table][0]] >= after)
+    return keep
+
+
+def _month_number(dates: pd.Series) -> pd.Series:
+    return dates.dt.year * 12 + dates.dt.month
+
+
+def _previous_observed(df: pd.DataFrame, first: pd.Timestamp) -> pd.Series:
+    """Subscriptions ending before `first` in their account's last month with MRR before it.
+
+    Phase 2B's prior_mrr is the account's previous observed month, which can lie
+    any distance before the window; these rows keep that month complete.
+    """
+    early = df["end_date"] < first
+    end_month = _month_number(df["end_date"]).where(early)
+    last = end_month.groupby(df["account_id"]).transform("max")
+    return early & end_month.eq(last)
+
+
+def _first_observed_month(df: pd.DataFrame) -> pd.Series:
+    """Each account's first month with MRR: the earliest start among rows phase 1 expands."""
+    valid = df[["account_id", "start_date", "end_date", "mrr_amount"]].notna().all(axis=1)
+    return _month_number(df.loc[valid, "start_date"]).groupby(df.loc[valid, "account_id"]).min()
+
+
+def _first_observed(df: pd.DataFrame, after: pd.Timestamp, first_month: pd.Series) -> pd.Series:
+    """Subscriptions starting after the window in their account's first observed month.
+
+    Phase 2A's starting MRR is the account's first observed month, which for
+    signups inside the window can lie after it; these rows keep that month complete.
+    """
+    late = df.loc[(df["start_date"] >= after) & df[["account_id", "end_date", "mrr_amount"]].notna().all(axis=1)]
+    hit = _month_number(late["start_date"]).eq(late["account_id"].map(first_month))
+    return hit.reindex(df.index, fill_value=False)
+
+
+def _load(table: str, keep_raw_dates: bool = False) -> tuple[pd.DataFrame, pd.DataFrame | None, dict[str, pd.Series]]:
+    """Read one raw export and parse its dates, filtering each chunk to the month window if one is set.
+
+    The index is the row number in the export. Also returns the unparsed date columns
+    (if requested) and which date values were present before parsing.
+    """
+    path = RAW / RAW_FILES[table]
+    windowed = window_active()
+    first, end = month_window()
+    after = end + pd.offsets.MonthBegin(1) if end is not None else None
+    carry_previous = table == "subscriptions" and first is not None
+    carry_first = table == "subscriptions" and after is not None
+
+    def keep_rows(df: pd.DataFrame, first_month: pd.Series | None) -> pd.Series:
+        keep = _pushdown(table, df)
+        if carry_previous:
+            keep |= _previous_observed(df, first)
+        if carry_first:
+            keep |= _first_observed(df, after, first_month)
+        return keep
+
+    def select(df: pd.DataFrame, raw_dates: pd.DataFrame | None, present: dict[str, pd.Series], keep: pd.Series) -> tuple:
+        raw_dates = raw_dates.loc[keep] if keep_raw_dates else None
+        return df.loc[keep], raw_dates, {c: p.loc[keep] for c, p in present.items()}
+
+    parts, first_months = [], []
+    for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS) if windowed else [pd.read_csv(path)]:
+        raw_dates = chunk[DATE_COLUMNS[table]].copy() if keep_raw_dates else None
+        chunk, present = _parse(table, chunk)
+        if windowed:
+            first_month = _first_observed_month(chunk) if carry_first else None
+            first_months.append(first_month)
+            parts.append(select(chunk, raw_dates, present, keep_rows(chunk, first_month)))
+        else:
+            parts.append((chunk, raw_dates, present))
+    if len(parts) == 1:
+        return parts[0]
+    df = pd.concat([p[0] for p in parts])
+    raw_dates = pd.concat([p[1] for p in parts]) if keep_raw_dates else None
+    present = {c: pd.concat([p[2][c] for p in parts]) for c in DATE_COLUMNS[table]}
+    if carry_previous or carry_first:
+        # Each chunk kept its own candidates; reduce them to each account's months across all chunks.
+        first_month = pd.concat(first_months).groupby(level=0).min() if carry_first else None
+        return select(df, raw_dates, present, keep_rows(df, first_month))
+    return df, raw_dates, present
+
+
+def _duplicated(ids: pd.Series) -> pd.Series:
+    # factorize numbers values in order of first appearance, so a repeat is a code
+    # no larger than the running maximum of the codes before it.
+    codes, _ = pd.factorize(ids)
+    seen = np.maximum.accumulate(np.concatenate([[-1], codes[:-1]]))
+    return pd.Series((codes >= 0) & (codes <= seen), index=ids.index)
+
+
+@lru_cache(maxsize=1)
+def known_account_ids() -> pd.Index:
+    """Every account id in the accounts export (read once per process, ignoring any window)."""
+    ids = pd.read_csv(RAW / RAW_FILES["accounts"], usecols=["account_id"])["account_id"]
+    return pd.Index(ids.dropna().unique())
+
+
+def _unknown(codes: np.ndarray, uniques: pd.Index, known: pd.Index, index: pd.Index) -> pd.Series:
+    """Rows whose account id (factorized as codes/uniques) is not in `known`."""
+    # One lookup per distinct id; the trailing True maps missing ids (code -1) to "known".
+    is_known = np.append(known.get_indexer(uniques) >= 0, True)
+    return pd.Series(~is_known[codes], index=index)
+
+
+def check_accounts(df: pd.DataFrame) -> pd.DataFrame:
+    """One boolean column per reason code (True = rule violated)."""
+    return pd.DataFrame({
+        "MISSING_ACCOUNT_ID": df["account_id"].isna(),
+        "DUPLICATE_ACCOUNT_ID": _duplicated(df["account_id"]),
+        "BAD_SIGNUP_DATE": df["signup_date"].isna(),
+    })
+
+
+def _overlapping_same_tier(df: pd.DataFrame, account_codes: np.ndarray) -> pd.Series:
+    # Integer (account, tier) group codes keep the sort and the per-group scans off the string columns.
+    tier_codes, tiers = pd.factorize(df["plan_tier"])
+    ok = (account_codes >= 0) & (tier_codes >= 0) & df["start_date"].notna().to_numpy() & df["end_date"].notna().to_numpy()
+    rows = np.flatnonzero(ok)
+    group = account_codes[rows].astype(np.int64) * len(tiers) + tier_codes[rows]
+    start = df["start_date"].to_numpy()[rows]
+    # One int64 sort key (group, rank of start) sorts faster than np.lexsort on two keys.
+    starts, start_rank = np.unique(start, return_inverse=True)
+    order = np.argsort(group * len(starts) + start_rank, kind="stable")
+    group, start = group[order], start[order]
+    end = pd.Series(df["end_date"].to_numpy()[rows][order])
+
+    # Latest end among the group's earlier starts: running max per group, shifted by one row.
+    running = end.groupby(group, sort=False).cummax().to_numpy()
+    same = np.concatenate([[False], group[1:] == group[:-1]])
+    overlap = np.zeros(len(df), dtype=bool)
+    overlap[rows[order[1:]]] = same[1:] & (start[1:] < running[:-1])
+    return pd.Series(overlap, index=df.index)
+
+
+def check_subscriptions(df: pd.DataFrame, account_ids: pd.Index) -> pd.DataFrame:
+    mrr = pd.to_numeric(df["mrr_amount"], errors="coerce")
+    # Factorize account_id once; the unknown-account and overlap checks work on the codes.
+    codes, uniques = pd.factorize(df["account_id"])
+    return pd.DataFrame({
+        "MISSING_ACCOUNT_ID": pd.Series(codes < 0, index=df.index),
+        "UNKNOWN_ACCOUNT": _unknown(codes, uniques, account_ids, df.index),
+        "DUPLICATE_SUBSCRIPTION_ID": _duplicated(df["subscription_id"]),
+        "BAD_START_DATE": df["start_date"].isna(),
+        "BAD_END_DATE": df["end_date"].isna(),
+        "END_BEFORE_START": df["end_date"] < df["start_date"],
+        "MISSING_MRR": mrr.isna(),
+        "NEGATIVE_MRR": mrr < 0,
+        "OVERLAPPING_SAME_TIER": _overlapping_same_tier(df, codes),
+    })
+
+
+def check_churn_events(df: pd.DataFrame, account_ids: pd.Index) -> pd.DataFrame:
+    codes, uniques = pd.factorize(df["account_id"])
+    return pd.DataFrame({
+        "MISSING_ACCOUNT_ID": pd.Series(codes < 0, index=df.index),
+        "UNKNOWN_ACCOUNT": _unknown(codes, uniques, account_ids, df.index),
+        "DUPLICATE_CHURN_EVENT_ID": _duplicated(df["churn_event_id"]),
+        "BAD_CHURN_DATE": df["churn_date"].isna(),
+    })
+
+
+def check(table: str, df: pd.DataFrame, account_ids: pd.Index | None = None) -> pd.DataFrame:
+    if table == "accounts":
+        return check_accounts(df)
+    if account_ids is None:
+        account_ids = known_account_ids()
+    if table == "subscriptions":
+        return check_subscriptions(df, account_ids)
+    return check_churn_events(df, account_ids)
+
+
+def read_raw(table: str) -> pd.DataFrame:
+    """Load one raw export with parsed dates (quarantined rows dropped in strict mode)."""
+    df, _, _ = _load(table)
+    if strict_enabled():
+        df = df.loc[~check(table, df).any(axis=1).to_numpy()]
+    return df
+
+
+def reason_codes(flags: pd.DataFrame) -> pd.Series:
+    """';'-joined reason codes for rows that violate at least one rule."""
+    # Each row's flags as a bitmask; join the codes once per distinct mask, not per row.
+    mask = flags.to_numpy(dtype=np.int64) @ (np.int64(1) << np.arange(flags.shape[1], dtype=np.int64))
+    bad = np.flatnonzero(mask)
+    masks, inverse = np.unique(mask[bad], return_inverse=True)
+    codes = np.array(flags.columns, dtype=object)
+    labels = np.array([";".join(codes[((m >> np.arange(len(codes))) & 1) == 1]) for m in masks], dtype=object)
+    return pd.Series(labels[inverse], index=flags.index[bad], dtype=object)
+
+
+def load_validated() -> tuple[dict[str, pd.DataFrame], pd.DataFrame, pd.DataFrame]:
+    """Every raw table loaded once and checked on the parsed frame.
+
+    Returns the tables (quarantined rows dropped in strict mode), the quarantined
+    rows and the data-quality summary.
+    """
+    frames, quarantine, summary = {}, [], []
+    account_ids = None
+    for table in RAW_FILES:
+        df, raw_dates, present = _load(table, keep_raw_dates=True)
+        if table == "accounts" and not window_active():
+            # With a window, accounts are filtered too; check() then reads every account id.
+            account_ids = pd.Index(df["account_id"].dropna().unique())
+        flags = check(table, df, account_ids)
+        reasons = reason_codes(flags)
+        frames[table] = df.drop(index=reasons.index) if strict_enabled() else df
+
+        # Report rejected rows as they appear in the export (dates unparsed).
+        rejected = df.loc[reasons.index].assign(**raw_dates.loc[reasons.index]).astype("string")
+        rejected.insert(0, "reason", reasons)
+        rejected.insert(0, "source_line", reasons.index + 2)  # 1-based, after the header
+        rejected.insert(0, "table", table)
+        quarantine.append(rejected)
+
+        unparseable = sum(int((present[c] & df[c].isna()).sum()) for c in DATE_COLUMNS[table])
+        summary.append({"table": table, "check": "rows", "rows": len(df)})
+        summary.append({"table": table, "check": "quarantined", "rows": len(reasons)})
+        summary.append({"table": table, "check": "unparseable_dates", "rows": unparseable})
+        summary += [{"table": table, "check": code, "rows": int(n)} for code, n in flags.sum().items()]
+
+    summary = pd.DataFrame(summary)
+    totals = summary.loc[summary["check"] == "rows"].set_index("table")["rows"]
+    summary["share"] = summary["rows"] / summary["table"].map(totals).replace(0, np.nan)
+    return frames, pd.concat(quarantine, ignore_index=True), summary
+
+
+def validate() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Quarantined rows of every raw table and the data-quality summary."""
+    _, quarantine, summary = load_validated()
+    return quarantine, summary
+
+
+def write_report(quarantine: pd.DataFrame, summary: pd.DataFrame) -> None:
+    PROC.mkdir(parents=True, exist_ok=True)
+    write_table(quarantine, QUARANTINE_PATH)
+    write_table(summary, SUMMARY_PATH)
+
+
+def main() -> None:
+    quarantine, summary = validate()
+    write_report(quarantine, summary)
+
+    print(summary.loc[(summary["rows"] > 0) | summary["check"].isin(["rows", "quarantined"])].to_string(index=False))
+    print(f"Quarantined {len(quarantine)} rows -> {QUARANTINE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
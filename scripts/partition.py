@@ -0,0 +1,43 @@
+"""Hash partitioning by account_id for multi-core execution of account-level phases.
+
+Set PIPELINE_PARTITIONS=N (or run_all.py --partitions N) to split the inputs of
+phase 1 and phase 2B into N shards by a stable hash of account_id and run the
+account-level steps of each shard in a process pool. Every account lands in
+exactly one shard, so per-account work (month expansion, shifts, churn joins)
+needs no cross-shard state and per-month results combine by concatenation or
+summation. Unset, 0 or 1 keeps the single-process path.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+PARTITIONS_ENV = "PIPELINE_PARTITIONS"
+
+
+def partitions() -> int:
+    try:
+        return max(int(os.environ.get(PARTITIONS_ENV, "1") or 1), 1)
+    except ValueError:
+        raise SystemExit(f"{PARTITIONS_ENV} must be an integer") from None
+
+
+def shard_of(account_id: pd.Series, n: int) -> np.ndarray:
+    """Stable shard index per row (same account -> same shard in every table)."""
+    return (pd.util.hash_array(account_id.astype(str).to_numpy()) % np.uint64(n)).astype(np.int64)
+
+
+def split_by_account(df: pd.DataFrame, n: int) -> list[pd.DataFrame]:
+    shard = shard_of(df["account_id"], n)
+    return [df.loc[shard == i] for i in range(n)]
+
+
+def map_shards(fn: Callable, *shard_lists: list, workers: int | None = None) -> list:
+    """Run fn(shard_a[i], shard_b[i], ...) for every shard in a process pool."""
+    with ProcessPoolExecutor(max_workers=workers or min(len(shard_lists[0]), os.cpu_count() or 1)) as pool:
+        return list(pool.map(fn, *shard_lists))
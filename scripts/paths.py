@@ -0,0 +1,35 @@
+"""Input and output locations shared by the pipeline scripts.
+
+Defaults match the repo layout. Each location can be overridden through the
+environment (run_all.py exposes the same settings as flags and passes them on
+to every phase):
+
+- PIPELINE_RAW_DIR: raw ravenstack_*.csv inputs; only download_data.py writes here.
+- PIPELINE_OUTPUT_ROOT: base for every output below (default: repo root).
+- PIPELINE_PROCESSED_DIR: processed tables (default: <output root>/data/processed).
+- PIPELINE_FIGURES_DIR: figures (default: <output root>/docs/figures).
+- PIPELINE_RECOMMENDATION_PATH: recommendation markdown
+  (default: <output root>/analysis_recommendation.md).
+- PIPELINE_HASHES_FILE: raw data hashes (default: <output root>/data/hashes.sha256).
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _env_path(name: str, default: Path) -> Path:
+    value = os.environ.get(name)
+    return Path(value).expanduser().resolve() if value else default
+
+
+OUTPUT_ROOT = _env_path("PIPELINE_OUTPUT_ROOT", ROOT)
+
+RAW = _env_path("PIPELINE_RAW_DIR", ROOT / "data" / "raw" / "ravenstack")
+PROC = _env_path("PIPELINE_PROCESSED_DIR", OUTPUT_ROOT / "data" / "processed")
+FIGURES = _env_path("PIPELINE_FIGURES_DIR", OUTPUT_ROOT / "docs" / "figures")
+RECOMMENDATION = _env_path("PIPELINE_RECOMMENDATION_PATH", OUTPUT_ROOT / "analysis_recommendation.md")
+HASHES_FILE = _env_path("PIPELINE_HASHES_FILE", OUTPUT_ROOT / "data" / "hashes.sha256")
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from pathlib import Path
 
 import pandas as pd
 
-ROOT = Path(__file__).resolve().parents[1]
-RAW = ROOT / "data" / "raw" / "ravenstack"
-OUT_DIR = ROOT / "data" / "processed"
+from artifacts import write_table
+from ingest import load_validated, read_raw, write_report
+from partition import map_shards, partitions, split_by_account
+from paths import PROC
+from sketches import approx_enabled, hll_estimate, hll_merge, hll_registers, hll_registers_chunked
+from window import clip_account_months, clip_months
+
+OUT_DIR = PROC
 
 
 @dataclass
@@ -16,15 +20,9 @@ class BaselineResult:
 
 
 def load_raw() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    accounts = pd.read_csv(RAW / "ravenstack_accounts.csv")
-    subs = pd.read_csv(RAW / "ravenstack_subscriptions.csv")
-    churn = pd.read_csv(RAW / "ravenstack_churn_events.csv")
-
-    accounts["signup_date"] = pd.to_datetime(accounts["signup_date"], errors="coerce")
-    subs["start_date"] = pd.to_datetime(subs["start_date"], errors="coerce")
-    subs["end_date"] = pd.to_datetime(subs["end_date"], errors="coerce")
-    churn["churn_date"] = pd.to_datetime(churn["churn_date"], errors="coerce")
-
+    accounts = read_raw("accounts")
+    subs = read_raw("subscriptions")
+    churn = read_raw("churn_events")
     return accounts, subs, churn
 
 
@@ -78,15 +76,45 @@ def build_account_month_mrr(subs: pd.DataFrame) -> pd.DataFrame:
     return am_agg
 
 
-def compute_monthly_net_revenue(am: pd.DataFrame) -> pd.DataFrame:
+def build_shard(subs: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+    """Account-months of one shard, plus its active-account HLL registers in approx mode."""
+    am = build_account_month_mrr(subs)
+    if not approx_enabled() or am.empty:
+        return am, None
+    return am, hll_registers(am["month"], am["account_id"])
+
+
+def build_account_month_mrr_partitioned(subs: pd.DataFrame, n: int) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+    # Accounts never span shards, so each shard's account-months are final; only the order needs restoring.
+    shards = [s for s in map_shards(build_shard, split_by_account(subs, n)) if not s[0].empty]
+    if not shards:
+        return pd.DataFrame(), None
+    am = pd.concat([s[0] for s in shards], ignore_index=True).sort_values(["month", "account_id"])
+    registers = [s[1] for s in shards if s[1] is not None]
+    return am, (hll_merge(*registers) if registers else None)
+
+
+def compute_monthly_net_revenue(am: pd.DataFrame, active_hll: pd.DataFrame | None = None) -> pd.DataFrame:
     # Net Revenue (Monthly) = sum of account-month MRR
-    m = (
-        am.groupby("month", as_index=False)
-        .agg(net_revenue=("mrr_amount", "sum"),
-             active_accounts=("account_id", "nunique"),
-             arpa=("mrr_amount", "mean"))
-        .sort_values("month")
-    )
+    if not approx_enabled():
+        m = (
+            am.groupby("month", as_index=False)
+            .agg(net_revenue=("mrr_amount", "sum"),
+                 active_accounts=("account_id", "nunique"),
+                 arpa=("mrr_amount", "mean"))
+            .sort_values("month")
+        )
+    else:
+        # Approx mode: distinct accounts come from HLL registers merged per shard/chunk, not nunique.
+        m = (
+            am.groupby("month", as_index=False)
+            .agg(net_revenue=("mrr_amount", "sum"), arpa=("mrr_amount", "mean"))
+            .sort_values("month")
+        )
+        if active_hll is None:
+            active_hll = hll_registers_chunked(am["month"], am["account_id"])
+        active = hll_estimate(active_hll).round().astype("int64")
+        m.insert(2, "active_accounts", active.reindex(m["month"]).to_numpy())
 
     m["mom_growth"] = m["net_revenue"].pct_change()
     m["yoy_growth"] = m["net_revenue"].pct_change(12)
@@ -96,17 +124,24 @@ def compute_monthly_net_revenue(am: pd.DataFrame) -> pd.DataFrame:
 def main() -> None:
     OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    accounts, subs, churn = load_raw()
+    # Load every raw table once; the ingest checks run on these parsed frames.
+    frames, quarantine, summary = load_validated()
+    write_report(quarantine, summary)
+    subs = frames["subscriptions"]
 
-    am = build_account_month_mrr(subs)
+    n = partitions()
+    am, active_hll = build_account_month_mrr_partitioned(subs, n) if n > 1 else (build_account_month_mrr(subs), None)
+    # Subscriptions straddling the window edges expand past it; those months are incomplete.
+    # Each account's last earlier month is kept for phase 2B's prior MRR, but not aggregated.
+    am = clip_account_months(am)
     if am.empty:
         raise SystemExit("No account-month rows built from subscriptions")
 
-    monthly = compute_monthly_net_revenue(am)
+    monthly = compute_monthly_net_revenue(clip_months(am), active_hll)
 
     # Persist
-    am.to_csv(OUT_DIR / "account_month_mrr.csv", index=False)
-    monthly.to_csv(OUT_DIR / "monthly_net_revenue.csv", index=False)
+    write_table(am, OUT_DIR / "account_month_mrr.csv")
+    write_table(monthly, OUT_DIR / "monthly_net_revenue.csv")
 
     # Print a tight summary for logs
     print("Built account-month table:", am.shape)
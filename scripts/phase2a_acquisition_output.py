@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-from pathlib import Path
-
 import pandas as pd
 
-ROOT = Path(__file__).resolve().parents[1]
-RAW = ROOT / "data" / "raw" / "ravenstack"
-PROC = ROOT / "data" / "processed"
+from artifacts import read_table, write_table
+from ingest import read_raw
+from paths import PROC
+from sketches import approx_enabled, approx_median
+from window import clip_months
+
 PROC.mkdir(parents=True, exist_ok=True)
 
 
@@ -15,11 +16,9 @@ def month_floor(s: pd.Series) -> pd.Series:
 
 
 def main() -> None:
-    accounts = pd.read_csv(RAW / "ravenstack_accounts.csv")
-    accounts["signup_date"] = pd.to_datetime(accounts["signup_date"], errors="coerce")
+    accounts = read_raw("accounts")
 
-    account_month = pd.read_csv(PROC / "account_month_mrr.csv")
-    account_month["month"] = pd.to_datetime(account_month["month"], errors="coerce")
+    account_month = read_table(PROC / "account_month_mrr.csv")
 
     # New accounts per month
     accounts = accounts.dropna(subset=["account_id", "signup_date"]).copy()
@@ -50,21 +49,30 @@ def main() -> None:
 
     # Join to accounts and aggregate starting MRR by signup month
     joined = accounts.merge(first_mrr, on="account_id", how="left")
+    approx = approx_enabled()
+    # Approx mode skips the exact median and inserts the quantile-sketch estimate instead.
+    median_agg = {} if approx else {"median_starting_mrr": ("starting_mrr", "median")}
     starting = (
         joined.groupby("signup_month", as_index=False)
         .agg(
             avg_starting_mrr=("starting_mrr", "mean"),
-            median_starting_mrr=("starting_mrr", "median"),
+            **median_agg,
             pct_missing_starting_mrr=("starting_mrr", lambda s: float(s.isna().mean())),
         )
         .sort_values("signup_month")
         .rename(columns={"signup_month": "month"})
     )
+    if approx:
+        med = approx_median(joined["signup_month"], joined["starting_mrr"])
+        starting.insert(2, "median_starting_mrr", med.reindex(starting["month"]).to_numpy())
+
+    # Only the window end is pushed down for accounts (phase 2B needs early signups for tenure)
+    new_accounts, mix, starting = clip_months(new_accounts), clip_months(mix), clip_months(starting)
 
     # Save outputs
-    new_accounts.to_csv(PROC / "hypA_new_accounts_per_month.csv", index=False)
-    mix.to_csv(PROC / "hypA_referral_source_mix.csv", index=False)
-    starting.to_csv(PROC / "hypA_starting_mrr_trend.csv", index=False)
+    write_table(new_accounts, PROC / "hypA_new_accounts_per_month.csv")
+    write_table(mix, PROC / "hypA_referral_source_mix.csv")
+    write_table(starting, PROC / "hypA_starting_mrr_trend.csv")
 
     # Tight printout
     print("New accounts months:", new_accounts["month"].min(), "to", new_accounts["month"].max())
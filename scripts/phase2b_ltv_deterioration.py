@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-from pathlib import Path
-
+import numpy as np
 import pandas as pd
 
-ROOT = Path(__file__).resolve().parents[1]
-RAW = ROOT / "data" / "raw" / "ravenstack"
-PROC = ROOT / "data" / "processed"
+from artifacts import read_table, write_table
+from ingest import read_raw
+from partition import map_shards, partitions, split_by_account
+from paths import PROC
+from sketches import approx_enabled, hll_estimate, hll_merge, hll_registers_chunked
+from window import clip_months
+
 PROC.mkdir(parents=True, exist_ok=True)
 
 
@@ -14,47 +17,26 @@ def month_floor(s: pd.Series) -> pd.Series:
     return s.dt.to_period("M").dt.to_timestamp()
 
 
-def main() -> None:
-    accounts = pd.read_csv(RAW / "ravenstack_accounts.csv")
-    subs = pd.read_csv(RAW / "ravenstack_subscriptions.csv")
-    churn_events = pd.read_csv(RAW / "ravenstack_churn_events.csv")
-
-    accounts["signup_date"] = pd.to_datetime(accounts["signup_date"], errors="coerce")
-    subs["start_date"] = pd.to_datetime(subs["start_date"], errors="coerce")
-    subs["end_date"] = pd.to_datetime(subs["end_date"], errors="coerce")
-    churn_events["churn_date"] = pd.to_datetime(churn_events["churn_date"], errors="coerce")
-
-    # Load account-month MRR built in Phase 1
-    am = pd.read_csv(PROC / "account_month_mrr.csv")
-    am["month"] = pd.to_datetime(am["month"], errors="coerce")
+def tenure_bucket(tenure_months: pd.Series) -> pd.Series:
+    """Bucket tenure in months: 0-2, 3-5, 6-11, 12+ (unknown if missing or negative)."""
+    t = tenure_months.astype("float64")
+    labels = np.select(
+        [t.isna() | (t < 0), t <= 2, t <= 5, t <= 11],
+        ["unknown", "0-2", "3-5", "6-11"],
+        default="12+",
+    )
+    return pd.Series(labels, index=tenure_months.index)
 
-    # Add tenure months proxy based on signup_date
-    a = accounts.dropna(subset=["account_id", "signup_date"]).copy()
-    a["signup_month"] = month_floor(a["signup_date"])
 
+def enrich_account_months(am: pd.DataFrame, a: pd.DataFrame, churn_month: pd.DataFrame) -> pd.DataFrame:
+    """Per-account columns: tenure, prior-month MRR, churn month and MRR deltas (needs whole accounts)."""
     am = am.merge(a[["account_id", "signup_month"]], on="account_id", how="left")
-    am["tenure_months"] = ((am["month"].dt.to_period("M") - am["signup_month"].dt.to_period("M")).apply(lambda x: x.n)).astype("Int64")
+    # Calendar-month difference; missing signup months (accounts outside the load) give <NA>.
+    month, signup = am["month"], am["signup_month"]
+    am["tenure_months"] = ((month.dt.year - signup.dt.year) * 12 + (month.dt.month - signup.dt.month)).astype("Int64")
 
     # Tenure buckets
-    def bucket(t):
-        if pd.isna(t) or t < 0:
-            return "unknown"
-        if t <= 2:
-            return "0-2"
-        if t <= 5:
-            return "3-5"
-        if t <= 11:
-            return "6-11"
-        return "12+"
-
-    am["tenure_bucket"] = am["tenure_months"].apply(bucket)
-
-    # Churn month at account level (from churn_events)
-    ce = churn_events.dropna(subset=["account_id", "churn_date"]).copy()
-    ce["churn_month"] = month_floor(ce["churn_date"])
-
-    # If multiple churn events exist, take earliest churn_month
-    churn_month = ce.sort_values(["account_id", "churn_month"]).groupby("account_id", as_index=False).first()[["account_id", "churn_month"]]
+    am["tenure_bucket"] = tenure_bucket(am["tenure_months"])
 
     # Add prior-month MRR for churn impact timing (t-1)
     am = am.sort_values(["account_id", "month"])
@@ -63,44 +45,82 @@ def main() -> None:
     # Monthly churned revenue: for accounts whose churn_month == month, take prior_mrr
     am = am.merge(churn_month, on="account_id", how="left")
     am["is_churn_month"] = am["churn_month"].eq(am["month"])
-    churn_rev = (
-        am.loc[am["is_churn_month"].fillna(False)]
-        .groupby("month", as_index=False)
-        .agg(churned_mrr=("prior_mrr", "sum"), churned_accounts=("account_id", "nunique"))
-        .sort_values("month")
-    )
+
+    # Expansion / contraction from account-month MRR deltas (ignore churn months for delta classification)
+    am["delta_mrr"] = am["mrr_amount"] - am["prior_mrr"]
+    am["expansion_mrr"] = am["delta_mrr"].where(am["delta_mrr"] > 0, 0)
+    am["contraction_mrr"] = (-am["delta_mrr"]).where(am["delta_mrr"] < 0, 0)
+    return am
+
+
+def monthly_parts(am: pd.DataFrame, a: pd.DataFrame, churn_month: pd.DataFrame) -> dict:
+    """Per-month partial aggregates of one set of whole accounts; parts of disjoint sets add up."""
+    am = enrich_account_months(am, a, churn_month)
+    churned = am.loc[am["is_churn_month"].fillna(False)]
+    approx = approx_enabled()
+    # Approx mode skips the exact distinct count; finalize() estimates it from the merged HLL registers.
+    active_aggs = {"start_mrr": ("mrr_amount", "sum")} if approx else {
+        "active_accounts": ("account_id", "nunique"),
+        "start_mrr": ("mrr_amount", "sum"),
+    }
+    parts = {
+        "churn_rev": (
+            churned.groupby("month", as_index=False)
+            .agg(churned_mrr=("prior_mrr", "sum"), churned_accounts=("account_id", "nunique"))
+            .sort_values("month")
+        ),
+        "active": am.groupby("month", as_index=False).agg(**active_aggs),
+        # Tenure-segmented churn (approx): compute churned accounts by tenure bucket at churn month
+        "churn_tenure": (
+            churned.groupby(["month", "tenure_bucket"], as_index=False)
+            .agg(churned_accounts=("account_id", "nunique"), churned_mrr=("prior_mrr", "sum"))
+            .sort_values(["month", "tenure_bucket"])
+        ),
+        "bridge": (
+            am.groupby("month", as_index=False)
+            .agg(
+                expansion_mrr=("expansion_mrr", "sum"),
+                contraction_mrr=("contraction_mrr", "sum"),
+            )
+            .sort_values("month")
+        ),
+    }
+    if approx:
+        parts["active_hll"] = hll_registers_chunked(am["month"], am["account_id"])
+    return parts
+
+
+def combine_parts(shards: list[dict]) -> dict:
+    """Add up per-shard parts (accounts are disjoint, so distinct counts add too; HLL registers merge)."""
+    if len(shards) == 1:
+        return shards[0]
+    keys = {"churn_rev": ["month"], "active": ["month"], "churn_tenure": ["month", "tenure_bucket"], "bridge": ["month"]}
+    parts = {
+        name: pd.concat([p[name] for p in shards], ignore_index=True).groupby(by, as_index=False).sum()
+        for name, by in keys.items()
+    }
+    if "active_hll" in shards[0]:
+        parts["active_hll"] = hll_merge(*[p["active_hll"] for p in shards])
+    return parts
+
+
+def finalize(parts: dict) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    churn_rev, active, churn_tenure = parts["churn_rev"], parts["active"], parts["churn_tenure"]
 
     # Churn rate (logo churn) by month overall and by tenure bucket
     churn_logo_overall = churn_rev[["month", "churned_accounts"]].copy()
 
     # Denominator: active accounts in prior month
-    active = am.groupby("month", as_index=False).agg(active_accounts=("account_id", "nunique"), start_mrr=("mrr_amount", "sum"))
+    if "active_hll" in parts:
+        active["active_accounts"] = hll_estimate(parts["active_hll"]).round().astype("int64").reindex(active["month"]).to_numpy()
     active["prior_active_accounts"] = active["active_accounts"].shift(1)
     active["prior_start_mrr"] = active["start_mrr"].shift(1)
 
     churn_logo_overall = churn_logo_overall.merge(active[["month", "prior_active_accounts"]], on="month", how="left")
     churn_logo_overall["churn_rate"] = churn_logo_overall["churned_accounts"] / churn_logo_overall["prior_active_accounts"]
 
-    # Tenure-segmented churn (approx): compute churned accounts by tenure bucket at churn month
-    churn_tenure = (
-        am.loc[am["is_churn_month"].fillna(False)]
-        .groupby(["month", "tenure_bucket"], as_index=False)
-        .agg(churned_accounts=("account_id", "nunique"), churned_mrr=("prior_mrr", "sum"))
-        .sort_values(["month", "tenure_bucket"])
-    )
-
-    # Expansion / contraction from account-month MRR deltas (ignore churn months for delta classification)
-    am["delta_mrr"] = am["mrr_amount"] - am["prior_mrr"]
-    am["expansion_mrr"] = am["delta_mrr"].where(am["delta_mrr"] > 0, 0)
-    am["contraction_mrr"] = (-am["delta_mrr"]).where(am["delta_mrr"] < 0, 0)
-
     bridge = (
-        am.groupby("month", as_index=False)
-        .agg(
-            expansion_mrr=("expansion_mrr", "sum"),
-            contraction_mrr=("contraction_mrr", "sum"),
-        )
-        .sort_values("month")
+        parts["bridge"]
         .merge(churn_rev[["month", "churned_mrr"]], on="month", how="left")
         .merge(active[["month", "prior_start_mrr"]], on="month", how="left")
     )
@@ -109,11 +129,43 @@ def main() -> None:
     # NRR-style signal (using prior month start MRR)
     bridge["net_retained_mrr"] = bridge["prior_start_mrr"] + bridge["expansion_mrr"] - bridge["contraction_mrr"] - bridge["churned_mrr"]
     bridge["nrr"] = bridge["net_retained_mrr"] / bridge["prior_start_mrr"]
+    return churn_logo_overall, churn_tenure, bridge
+
+
+def main() -> None:
+    accounts = read_raw("accounts")
+    churn_events = read_raw("churn_events")
+
+    # Load account-month MRR built in Phase 1
+    am = read_table(PROC / "account_month_mrr.csv")
+
+    # Add tenure months proxy based on signup_date
+    a = accounts.dropna(subset=["account_id", "signup_date"]).copy()
+    a["signup_month"] = month_floor(a["signup_date"])
+
+    # Churn month at account level (from churn_events)
+    ce = churn_events.dropna(subset=["account_id", "churn_date"]).copy()
+    ce["churn_month"] = month_floor(ce["churn_date"])
+
+    # If multiple churn events exist, take earliest churn_month
+    churn_month = ce.sort_values(["account_id", "churn_month"]).groupby("account_id", as_index=False).first()[["account_id", "churn_month"]]
+
+    n = partitions()
+    if n > 1:
+        # Small inputs leave some shards without account-months; monthly_parts needs at least one row.
+        splits = zip(split_by_account(am, n), split_by_account(a, n), split_by_account(churn_month, n))
+        am_s, a_s, churn_s = zip(*[s for s in splits if not s[0].empty])
+        shards = map_shards(monthly_parts, list(am_s), list(a_s), list(churn_s))
+    else:
+        shards = [monthly_parts(am, a, churn_month)]
+    churn_logo_overall, churn_tenure, bridge = finalize(combine_parts(shards))
+    # Account-months before the window only supply prior MRR; drop their month rows.
+    churn_logo_overall, churn_tenure, bridge = clip_months(churn_logo_overall), clip_months(churn_tenure), clip_months(bridge)
 
     # Save outputs
-    churn_logo_overall.to_csv(PROC / "hypB_churn_rate_overall.csv", index=False)
-    churn_tenure.to_csv(PROC / "hypB_churn_by_tenure_bucket.csv", index=False)
-    bridge.to_csv(PROC / "hypB_revenue_bridge_components.csv", index=False)
+    write_table(churn_logo_overall, PROC / "hypB_churn_rate_overall.csv")
+    write_table(churn_tenure, PROC / "hypB_churn_by_tenure_bucket.csv")
+    write_table(bridge, PROC / "hypB_revenue_bridge_components.csv")
 
     # Print tight summary
     print("Bridge months:", bridge["month"].min(), "to", bridge["month"].max())
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-from pathlib import Path
-
 import pandas as pd
 
-ROOT = Path(__file__).resolve().parents[1]
-RAW = ROOT / "data" / "raw" / "ravenstack"
-PROC = ROOT / "data" / "processed"
+from artifacts import read_table, write_table
+from ingest import read_raw
+from paths import PROC
+from sketches import approx_enabled, approx_median
+from window import clip_months
+
 PROC.mkdir(parents=True, exist_ok=True)
 
 
@@ -15,17 +16,13 @@ def month_floor(s: pd.Series) -> pd.Series:
 
 
 def main() -> None:
-    subs = pd.read_csv(RAW / "ravenstack_subscriptions.csv")
-    subs["start_date"] = pd.to_datetime(subs["start_date"], errors="coerce")
-    subs["end_date"] = pd.to_datetime(subs["end_date"], errors="coerce")
+    subs = read_raw("subscriptions")
 
     # Load account-month MRR
-    am = pd.read_csv(PROC / "account_month_mrr.csv")
-    am["month"] = pd.to_datetime(am["month"], errors="coerce")
+    am = read_table(PROC / "account_month_mrr.csv")
 
     # ARPA drift is already in monthly_net_revenue, but compute explicitly here for isolation
-    monthly = pd.read_csv(PROC / "monthly_net_revenue.csv")
-    monthly["month"] = pd.to_datetime(monthly["month"], errors="coerce")
+    monthly = read_table(PROC / "monthly_net_revenue.csv")
     arpa = monthly[["month", "arpa", "active_accounts", "net_revenue"]].copy()
 
     # Plan tier mix by month using subscription-month expansion
@@ -47,6 +44,8 @@ def main() -> None:
             m = (pd.Timestamp(m) + pd.offsets.MonthBegin(1)).normalize()
 
     sm = pd.DataFrame(rows)
+    if not sm.empty:
+        sm = clip_months(sm)
     # Aggregate plan tier mix by account-month (take highest MRR subscription tier for simplicity)
     if not sm.empty:
         # rank within account-month by mrr_amount
@@ -69,18 +68,24 @@ def main() -> None:
 
     # Seat migration proxy: average seats per active account per month (from subscriptions top-tier view)
     if not sm.empty:
+        approx = approx_enabled()
+        # Approx mode skips the exact median and adds the quantile-sketch estimate instead.
+        median_agg = {} if approx else {"median_seats": ("seats", "median")}
         seats_monthly = (
             sm_top.groupby("month", as_index=False)
-            .agg(avg_seats=("seats", "mean"), median_seats=("seats", "median"))
+            .agg(avg_seats=("seats", "mean"), **median_agg)
             .sort_values("month")
         )
+        if approx:
+            med = approx_median(sm_top["month"], sm_top["seats"])
+            seats_monthly["median_seats"] = med.reindex(seats_monthly["month"]).to_numpy()
     else:
         seats_monthly = pd.DataFrame(columns=["month", "avg_seats", "median_seats"])
 
     # Save outputs
-    arpa.to_csv(PROC / "hypC_arpa_drift.csv", index=False)
-    tier_mix.to_csv(PROC / "hypC_plan_tier_mix.csv", index=False)
-    seats_monthly.to_csv(PROC / "hypC_seat_migration.csv", index=False)
+    write_table(arpa, PROC / "hypC_arpa_drift.csv")
+    write_table(tier_mix, PROC / "hypC_plan_tier_mix.csv")
+    write_table(seats_monthly, PROC / "hypC_seat_migration.csv")
 
     print("ARPA months:", arpa["month"].min(), "to", arpa["month"].max())
     print("Plan tiers:", sorted(set(tier_mix["plan_tier"].dropna().unique().tolist())))
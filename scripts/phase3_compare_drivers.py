@@ -1,25 +1,48 @@
 from __future__ import annotations
 
-from pathlib import Path
+import argparse
+from itertools import product
+from math import factorial
 
+import numpy as np
 import pandas as pd
 
-ROOT = Path(__file__).resolve().parents[1]
-PROC = ROOT / "data" / "processed"
-PROC.mkdir(parents=True, exist_ok=True)
-
-
-def main() -> None:
-    # Load processed artifacts
-    monthly = pd.read_csv(PROC / "monthly_net_revenue.csv", parse_dates=["month"])
+from artifacts import read_table, write_table
+from paths import PROC
 
-    # Hyp A
-    new_accounts = pd.read_csv(PROC / "hypA_new_accounts_per_month.csv", parse_dates=["month"])
-    starting = pd.read_csv(PROC / "hypA_starting_mrr_trend.csv", parse_dates=["month"])
+PROC.mkdir(parents=True, exist_ok=True)
 
-    # Hyp B
-    bridge = pd.read_csv(PROC / "hypB_revenue_bridge_components.csv", parse_dates=["month"])
 
+OUT_COLS = [
+    "month",
+    "net_revenue",
+    "mom_growth",
+    "yoy_growth",
+    "new_accounts",
+    "avg_starting_mrr",
+    "acq_contribution",
+    "retention_contribution",
+    "pricing_contribution",
+    # lever
+    "acq_abs_3m",
+    "ret_abs_3m",
+    "prc_abs_3m",
+    "leader_lever_3m",
+    # pressure
+    "acq_pressure_3m",
+    "ret_pressure_3m",
+    "prc_pressure_3m",
+    "leader_pressure_3m",
+]
+
+
+def compare_drivers(
+    monthly: pd.DataFrame,
+    new_accounts: pd.DataFrame,
+    starting: pd.DataFrame,
+    bridge: pd.DataFrame,
+) -> pd.DataFrame:
+    """Driver contributions, lever and pressure views from the phase 1/2 monthly tables."""
     # Merge base timeline
     df = (
         monthly.merge(new_accounts, on="month", how="left")
@@ -90,33 +113,97 @@ def main() -> None:
 
     df["leader_pressure_3m"] = df.apply(leader_pressure, axis=1)
 
+    return df[OUT_COLS].copy()
+
+
+SHAPLEY_DRIVERS = ["acq", "ret", "prc"]
+
+
+def _shapley_weights(k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Coalition masks (2^k, k) and the (2^k, k) matrix mapping coalition values to Shapley values."""
+    masks = np.array(list(product([0, 1], repeat=k)), dtype=bool)
+    size = masks.sum(axis=1)
+    w = np.array([factorial(s) * factorial(k - s - 1) / factorial(k) for s in range(k)])
+    weights = np.where(masks, w[np.clip(size - 1, 0, k - 1)][:, None], -w[np.clip(size, 0, k - 1)][:, None])
+    return masks, weights
+
+
+def shapley_attribution(monthly: pd.DataFrame, new_accounts: pd.DataFrame, by: list[str] | None = None) -> pd.DataFrame:
+    """Exact Shapley split of each month's net revenue change across acquisition, retention and pricing.
+
+    Revenue in month t is written as R_t = (N_{t-1} * r + a) * p with
+    a = new accounts, r = (N_t - a) / N_{t-1} (logo retention of the prior base) and
+    p = ARPA. Moving from the prior month (r=1, a=0, p=ARPA_{t-1}) to month t
+    (r_t, a_t, p_t) changes revenue by exactly R_t - R_{t-1}; the Shapley values
+    average each driver's marginal effect over all orderings, so
+    acq_shapley + ret_shapley + prc_shapley == net_revenue_change.
+    Signs are revenue impact: positive is a tailwind, negative a drag.
+
+    All months and segments (`by` columns) are evaluated as one batch of array ops.
+    """
+    by = list(by or [])
+    df = (
+        monthly.merge(new_accounts[by + ["month", "new_accounts"]], on=by + ["month"], how="left")
+        .sort_values(by + ["month"])
+        .reset_index(drop=True)
+    )
+    df["new_accounts"] = df["new_accounts"].fillna(0)
+
+    cols = ["net_revenue", "active_accounts", "arpa"]
+    prior = df.groupby(by)[cols].shift(1) if by else df[cols].shift(1)
+    base = prior["active_accounts"].to_numpy(dtype=float)
+    a = df["new_accounts"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = (df["active_accounts"].to_numpy(dtype=float) - a) / base
+
+    # Driver values at the prior month (column 0) and this month (column 1), shape (n, k, 2).
+    start = np.stack([np.zeros_like(a), np.ones_like(r), prior["arpa"].to_numpy(dtype=float)], axis=1)
+    end = np.stack([a, r, df["arpa"].to_numpy(dtype=float)], axis=1)
+
+    masks, weights = _shapley_weights(len(SHAPLEY_DRIVERS))
+    # Coalition values for every month at once: drivers in the coalition take this month's value.
+    x = np.where(masks[None, :, :], end[:, None, :], start[:, None, :])
+    values = (base[:, None] * x[..., 1] + x[..., 0]) * x[..., 2]
+    phi = values @ weights
+
+    out = df[by + ["month", "net_revenue"]].copy()
+    out["net_revenue_change"] = df["net_revenue"] - prior["net_revenue"]
+    for i, d in enumerate(SHAPLEY_DRIVERS):
+        out[f"{d}_shapley"] = phi[:, i]
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--shapley",
+        action="store_true",
+        help="Also write an exact Shapley attribution of monthly net revenue change.",
+    )
+    args = ap.parse_args()
+
+    # Load processed artifacts
+    monthly = read_table(PROC / "monthly_net_revenue.csv")
+
+    # Hyp A
+    new_accounts = read_table(PROC / "hypA_new_accounts_per_month.csv")
+    starting = read_table(PROC / "hypA_starting_mrr_trend.csv")
+
+    # Hyp B
+    bridge = read_table(PROC / "hypB_revenue_bridge_components.csv")
+
+    out = compare_drivers(monthly, new_accounts, starting, bridge)
+
     # Persist
-    out_cols = [
-        "month",
-        "net_revenue",
-        "mom_growth",
-        "yoy_growth",
-        "new_accounts",
-        "avg_starting_mrr",
-        "acq_contribution",
-        "retention_contribution",
-        "pricing_contribution",
-        # lever
-        "acq_abs_3m",
-        "ret_abs_3m",
-        "prc_abs_3m",
-        "leader_lever_3m",
-        # pressure
-        "acq_pressure_3m",
-        "ret_pressure_3m",
-        "prc_pressure_3m",
-        "leader_pressure_3m",
-    ]
-    out = df[out_cols].copy()
-    out.to_csv(PROC / "phase3_driver_comparison.csv", index=False)
+    write_table(out, PROC / "phase3_driver_comparison.csv")
 
     print(out.tail(6).to_string(index=False))
 
+    if args.shapley:
+        attribution = shapley_attribution(monthly, new_accounts)
+        write_table(attribution, PROC / "phase3_shapley_attribution.csv")
+        print(attribution.tail(6).to_string(index=False))
+
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
-from pathlib import Path
+import argparse
 
+import numpy as np
 import pandas as pd
 
-ROOT = Path(__file__).resolve().parents[1]
-PROC = ROOT / "data" / "processed"
+from artifacts import read_table, table_exists, table_mtime, write_table
+from paths import PROC, RECOMMENDATION
+
+# Dominance rule: the pressure leader must hold for MIN_STREAK consecutive months
+# and beat the runner-up by MARGIN_THRESHOLD (the blueprint's >15-20% condition).
+MIN_STREAK = 3
+MARGIN_THRESHOLD = 0.15
+
+PRESSURE_COLS = ["acq_pressure_3m", "ret_pressure_3m", "prc_pressure_3m"]
 
 
 def _latest_non_null(series: pd.Series):
@@ -13,54 +21,115 @@ def _latest_non_null(series: pd.Series):
     return None if s.empty else s.iloc[-1]
 
 
-def _streak_length(series: pd.Series) -> int:
-    """Count consecutive identical non-null values at the end of a series."""
-    s = series.dropna()
-    if s.empty:
-        return 0
-    last = s.iloc[-1]
-    n = 0
-    for v in reversed(s.tolist()):
-        if v != last:
-            break
-        n += 1
-    return n
+def simulated_payoff(latest_month: pd.Timestamp) -> pd.DataFrame | None:
+    """Scenario simulation rows if simulate_scenarios.py ran on the current comparison window.
+
+    The simulation must also be newer than phase3_driver_comparison, so a leftover file
+    from an earlier --simulate run is not cited by a later run without it.
+    """
+    sim_path = PROC / "scenario_simulation.csv"
+    if not table_exists(sim_path):
+        return None
+    if table_mtime(sim_path) < table_mtime(PROC / "phase3_driver_comparison.csv"):
+        print(f"Ignoring {sim_path.name}: older than phase3_driver_comparison (rerun with --simulate)")
+        return None
+    sim = read_table(sim_path)
+    as_of = pd.Timestamp(sim["as_of_month"].iloc[0])
+    if as_of != latest_month:
+        print(f"Ignoring stale {sim_path.name} (as of {as_of:%Y-%m}, latest month {latest_month:%Y-%m})")
+        return None
+    return sim
+
+
+def backtest(
+    comp: pd.DataFrame,
+    by: list[str] | None = None,
+    min_streak: int = MIN_STREAK,
+    margin_threshold: float = MARGIN_THRESHOLD,
+) -> pd.DataFrame:
+    """Recommendation that would have been issued at every month of the comparison table.
+
+    Applies the same dominance rule as main() to all rows at once: streaks come from a
+    run-length encoding of leader_pressure_3m (rows without a leader are skipped, as in
+    the latest-window view) and the margin gate is evaluated row-wise. Pass `by` to
+    backtest many segments in one call; each segment is treated as its own series.
+    """
+    by = list(by or [])
+    df = comp.sort_values(by + ["month"]).reset_index(drop=True)
+
+    leader = df["leader_pressure_3m"]
+    has_leader = leader.notna()
+
+    # Run-length encode leader_pressure_3m within each segment, over rows with a leader.
+    led = df.loc[has_leader, by + ["leader_pressure_3m"]]
+    starts = led["leader_pressure_3m"].ne(led["leader_pressure_3m"].shift())
+    for c in by:
+        starts |= led[c].ne(led[c].shift())
+    run_id = starts.cumsum()
+    streak = (run_id.groupby(run_id).cumcount() + 1).reindex(df.index)
+
+    # Margin gate on all rows: top pressure vs runner-up.
+    vals = np.sort(df[PRESSURE_COLS].fillna(0.0).to_numpy(dtype=float), axis=1)
+    top = vals[:, -1]
+    runner = vals[:, -2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = np.where(top > 0, (top - runner) / top, np.nan)
+    margin_ok = (top > 0) & (np.nan_to_num(margin, nan=0.0) >= margin_threshold)
+
+    # Rows without a leader inherit the latest evaluated row in their segment,
+    # mirroring main()'s use of the latest non-null leader.
+    out = df[by + ["month", "leader_pressure_3m"]].copy()
+    out["pressure_streak"] = streak.where(has_leader)
+    out["pressure_margin"] = pd.Series(margin, index=df.index).where(has_leader)
+    out["pressure_margin_ok"] = pd.Series(margin_ok, index=df.index, dtype=object).where(has_leader)
+    out["pressure_leader"] = leader
+    carry = ["pressure_streak", "pressure_margin", "pressure_margin_ok", "pressure_leader"]
+    if by:
+        out[carry] = out.groupby(by)[carry].ffill()
+    else:
+        out[carry] = out[carry].ffill()
+    out["pressure_streak"] = out["pressure_streak"].fillna(0).astype("int64")
+    out["pressure_margin_ok"] = out["pressure_margin_ok"].fillna(False).astype(bool)
+
+    single = (out["pressure_streak"] >= min_streak) & out["pressure_margin_ok"]
+    out["recommendation_mode"] = np.where(single, "single-driver", "mixed-signal")
+    out["recommendation_driver"] = out["pressure_leader"].where(single)
+
+    verdict = out["recommendation_mode"] + ":" + out["recommendation_driver"].fillna("")
+    prev = verdict.groupby([out[c] for c in by]).shift() if by else verdict.shift()
+    out["verdict_changed"] = prev.notna() & verdict.ne(prev)
+
+    return out.drop(columns=["pressure_leader"])
 
 
 def main() -> None:
-    comp = pd.read_csv(PROC / "phase3_driver_comparison.csv", parse_dates=["month"])
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--backtest",
+        action="store_true",
+        help="Also write the recommendation that would have been issued at every month.",
+    )
+    args = ap.parse_args()
+
+    comp = read_table(PROC / "phase3_driver_comparison.csv")
 
     # Leaders
     lever_leader = _latest_non_null(comp.get("leader_lever_3m"))
     pressure_leader = _latest_non_null(comp.get("leader_pressure_3m"))
 
-    pressure_streak = _streak_length(comp.get("leader_pressure_3m")) if "leader_pressure_3m" in comp.columns else 0
-
-    # Margin gate: require the pressure leader to beat runner-up by a material margin.
-    # This implements the blueprint's >15-20% condition.
-    margin_threshold = 0.15
-    # Use latest row with non-null pressure leader
-    latest_row = comp.dropna(subset=["leader_pressure_3m"]).iloc[-1] if "leader_pressure_3m" in comp.columns else None
-    pressure_vals = {}
-    if latest_row is not None:
-        pressure_vals = {
-            "acquisition": float(latest_row.get("acq_pressure_3m", 0.0)),
-            "retention": float(latest_row.get("ret_pressure_3m", 0.0)),
-            "pricing": float(latest_row.get("prc_pressure_3m", 0.0)),
-        }
-    ordered = sorted(pressure_vals.items(), key=lambda kv: kv[1], reverse=True)
-    top = ordered[0][1] if ordered else 0.0
-    runner = ordered[1][1] if len(ordered) > 1 else 0.0
-    pressure_margin_ok = (top > 0) and ((top - runner) / top >= margin_threshold)
-
     # Recommendation rule: declare a single dominant pressure only if it holds for >=3 consecutive months
-    # AND exceeds the runner-up by a material margin (default 15%).
-    if pressure_streak >= 3 and pressure_margin_ok:
-        recommendation_driver = pressure_leader
-        recommendation_mode = "single-driver"
-    else:
-        recommendation_driver = None
-        recommendation_mode = "mixed-signal"
+    # AND exceeds the runner-up by a material margin (default 15%). Evaluated at the latest row with a
+    # pressure leader, using the same rule as the historical backtest.
+    bt = backtest(comp)
+    latest = bt.loc[bt["leader_pressure_3m"].notna()].iloc[-1]
+    pressure_streak = int(latest["pressure_streak"])
+    recommendation_mode = latest["recommendation_mode"]
+    recommendation_driver = pressure_leader if recommendation_mode == "single-driver" else None
+
+    if args.backtest:
+        write_table(bt, PROC / "phase4_recommendation_backtest.csv")
+        changes = int(bt["verdict_changed"].sum())
+        print(f"Backtest: {len(bt)} months, {changes} verdict changes")
 
     last6 = comp.tail(6)[[
         "month",
@@ -110,6 +179,30 @@ def main() -> None:
         md.append(f"Largest drag by directional pressure (latest window): **{pressure_leader}** (streak: {pressure_streak} months).")
         md.append("If you must pick one primary initiative under a hard constraint, prioritize the drag leader; use the lever leader as a secondary monitoring lens.")
 
+    sim = simulated_payoff(comp["month"].max())
+    if sim is not None:
+        scen = sim.loc[sim["lever"].notna()]
+        focus = scen.loc[scen["driver"] == recommendation_driver] if recommendation_driver else scen
+        best = focus.loc[focus["uplift_p50"].idxmax()] if not focus.empty else None
+        md.append("")
+        md.append(f"## Simulated payoff (next {int(sim['horizon_months'].iloc[0])} months)")
+        md.append(
+            f"Monte Carlo projection of net revenue over {int(sim['paths'].iloc[0]):,} paths per scenario, "
+            f"with rates fitted on the last {int(sim['fit_months'].iloc[0])} months (scripts/simulate_scenarios.py)."
+        )
+        if best is not None:
+            md.append(
+                f"Largest median uplift{' for ' + recommendation_driver if recommendation_driver else ''}: **{best['scenario']}** "
+                f"({best['uplift_p50']:,.0f}; 90% interval {best['uplift_p05']:,.0f} to {best['uplift_p95']:,.0f})."
+            )
+        md.append("")
+        table = sim[["scenario", "driver", "p05", "p50", "p95", "uplift_p50", "prob_uplift_positive"]].copy()
+        for c in ["p05", "p50", "p95", "uplift_p50"]:
+            table[c] = table[c].round(0)
+        table["driver"] = table["driver"].fillna("")
+        table["prob_uplift_positive"] = table["prob_uplift_positive"].round(3).astype(object).where(table["prob_uplift_positive"].notna(), "")
+        md.append(table.to_markdown(index=False))
+
     md.append("")
     md.append("## Evidence snapshot (last 6 months)")
     md.append("")
@@ -128,7 +221,8 @@ def main() -> None:
     md.append("- No cost data is available, so margin is not modeled.")
     md.append("- Expansion and contraction are inferred from account-month MRR deltas; validate with billing event logic in a real system.")
 
-    out_path = ROOT / "analysis_recommendation.md"
+    out_path = RECOMMENDATION
+    out_path.parent.mkdir(parents=True, exist_ok=True)
     out_path.write_text("\n".join(md) + "\n", encoding="utf-8")
     print(f"Wrote {out_path}")
 
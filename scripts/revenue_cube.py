@@ -0,0 +1,318 @@
+"""Pre-aggregated revenue cube with a local query API.
+
+The cube holds additive measures at the grain
+(month, plan_tier, referral_source, industry, country, tenure_bucket), so any
+slice or rollup is a filter plus a groupby-sum over a small table instead of a
+re-run of the phases over raw CSVs.
+
+Grain and definitions follow the phases:
+- Each account-month lands in exactly one cell, so active_accounts is additive.
+  plan_tier is the tier of the account's highest-MRR subscription that month
+  (as in phase 2C); tenure_bucket uses the phase 2B buckets.
+- expansion_mrr / contraction_mrr / churned_mrr follow phase 2B (account-month
+  MRR deltas; churn impact = prior account-month MRR in the churn month).
+- prior_mrr is each account's previous observed account-month MRR, filed under
+  its month-t cell. It covers the same accounts as the expansion, contraction
+  and churn measures, so slice NRR stays consistent for time-varying
+  dimensions (tenure_bucket, monthly top plan_tier).
+- new_accounts and starting MRR follow phase 2A and are filed under the signup
+  month, tenure 0-2, and the account's tier in its first revenue month.
+
+Derived per-slice metrics (arpa, avg_starting_mrr, nrr) and the phase 3 driver
+contributions are computed from these sums at query time.
+
+Usage:
+- python scripts/revenue_cube.py build
+- python scripts/revenue_cube.py query --filter plan_tier=Enterprise --filter referral_source=partner --last 6
+- python scripts/revenue_cube.py query --filter country=DE --contributions
+- python scripts/revenue_cube.py serve --port 8050
+    GET /query?plan_tier=Enterprise&country=DE,UK&by=month,referral_source&start=2024-01
+    GET /contributions?industry=FinTech&last=6
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from artifacts import read_table, write_table
+from paths import PROC
+from phase1_baseline import load_raw
+from phase2b_ltv_deterioration import tenure_bucket
+from phase3_compare_drivers import compare_drivers
+
+CUBE_PATH = PROC / "revenue_cube.csv"
+
+DIMENSIONS = ["plan_tier", "referral_source", "industry", "country", "tenure_bucket"]
+MEASURES = [
+    "mrr",
+    "active_accounts",
+    "expansion_mrr",
+    "contraction_mrr",
+    "churned_mrr",
+    "churned_accounts",
+    "prior_mrr",
+    "new_accounts",
+    "starting_mrr_sum",
+    "starting_mrr_accounts",
+]
+ACCOUNT_DIMENSIONS = ["referral_source", "industry", "country"]
+
+
+def _account_month_tiers(subs: pd.DataFrame) -> pd.DataFrame:
+    """Account-month MRR and top-MRR tier, expanded with array ops (no Python loop)."""
+    s = subs.dropna(subset=["account_id", "start_date", "end_date", "mrr_amount"])
+    start = s["start_date"].dt.to_period("M").array.asi8
+    end = s["end_date"].dt.to_period("M").array.asi8
+    n = np.clip(end - start + 1, 0, None)
+
+    idx = np.repeat(np.arange(len(s)), n)
+    offset = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    rows = pd.DataFrame({
+        "account_id": s["account_id"].to_numpy()[idx],
+        "month": pd.PeriodIndex.from_ordinals(start[idx] + offset, freq="M").to_timestamp(),
+        "plan_tier": s["plan_tier"].fillna("unknown").to_numpy()[idx],
+        "mrr_amount": s["mrr_amount"].to_numpy(dtype=float)[idx],
+    })
+
+    am = rows.groupby(["account_id", "month"], as_index=False).agg(mrr=("mrr_amount", "sum"))
+    top = (
+        rows.sort_values(["account_id", "month", "mrr_amount"], ascending=[True, True, False], kind="stable")
+        .drop_duplicates(["account_id", "month"])[["account_id", "month", "plan_tier"]]
+    )
+    return am.merge(top, on=["account_id", "month"], how="left")
+
+
+def build_cube(accounts: pd.DataFrame, subs: pd.DataFrame, churn: pd.DataFrame) -> pd.DataFrame:
+    a = accounts.dropna(subset=["account_id"]).drop_duplicates("account_id").copy()
+    a["signup_month"] = a["signup_date"].dt.to_period("M").dt.to_timestamp()
+    for c in ACCOUNT_DIMENSIONS:
+        a[c] = a[c].fillna("unknown")
+
+    # Account-month facts
+    am = _account_month_tiers(subs)
+    am = am.merge(a[["account_id", "signup_month"] + ACCOUNT_DIMENSIONS], on="account_id", how="left")
+    for c in ACCOUNT_DIMENSIONS:
+        am[c] = am[c].fillna("unknown")
+    tenure = am["month"].dt.to_period("M").array.asi8 - am["signup_month"].dt.to_period("M").array.asi8
+    am["tenure_bucket"] = tenure_bucket(pd.Series(tenure, index=am.index).where(am["signup_month"].notna()))
+
+    am = am.sort_values(["account_id", "month"])
+    am["prior_mrr"] = am.groupby("account_id")["mrr"].shift(1)
+    delta = am["mrr"] - am["prior_mrr"]
+    am["expansion_mrr"] = delta.where(delta > 0, 0)
+    am["contraction_mrr"] = (-delta).where(delta < 0, 0)
+
+    ce = churn.dropna(subset=["account_id", "churn_date"])
+    churn_month = (ce["churn_date"].dt.to_period("M").dt.to_timestamp()).groupby(ce["account_id"]).min()
+    is_churn = am["account_id"].map(churn_month).eq(am["month"])
+    am["churned_mrr"] = am["prior_mrr"].where(is_churn, 0).fillna(0)
+    am["churned_accounts"] = is_churn.astype("int64")
+    am["active_accounts"] = 1
+
+    # Signup facts (phase 2A): starting MRR = first observed account-month MRR.
+    first = am.drop_duplicates("account_id")[["account_id", "mrr", "plan_tier"]]
+    sa = a.dropna(subset=["signup_month"]).merge(
+        first.rename(columns={"mrr": "starting_mrr", "plan_tier": "first_tier"}), on="account_id", how="left"
+    )
+    signups = pd.DataFrame({
+        "month": sa["signup_month"],
+        "plan_tier": sa["first_tier"].fillna(sa["plan_tier"]).fillna("unknown"),
+        **{c: sa[c] for c in ACCOUNT_DIMENSIONS},
+        "tenure_bucket": "0-2",
+        "new_accounts": 1,
+        "starting_mrr_sum": sa["starting_mrr"].fillna(0.0),
+        "starting_mrr_accounts": sa["starting_mrr"].notna().astype("int64"),
+    })
+
+    facts = pd.concat([am[["month"] + DIMENSIONS + MEASURES[:7]], signups], ignore_index=True)
+    facts[MEASURES] = facts[MEASURES].fillna(0)
+    cube = (
+        facts.groupby(["month"] + DIMENSIONS, as_index=False)[MEASURES]
+        .sum()
+        .sort_values(["month"] + DIMENSIONS)
+        .reset_index(drop=True)
+    )
+    counts = ["active_accounts", "churned_accounts", "new_accounts", "starting_mrr_accounts"]
+    cube[counts] = cube[counts].astype("int64")
+    return cube
+
+
+def _slice(cube: pd.DataFrame, filters: dict[str, list[str]] | None) -> pd.DataFrame:
+    mask = np.ones(len(cube), dtype=bool)
+    for dim, values in (filters or {}).items():
+        if dim not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {dim!r}; expected one of {DIMENSIONS}")
+        mask &= cube[dim].isin([values] if isinstance(values, str) else values).to_numpy()
+    return cube.loc[mask]
+
+
+def _month_window(df: pd.DataFrame, start: str | None, end: str | None, last: int | None) -> pd.DataFrame:
+    if start:
+        df = df.loc[df["month"] >= pd.Timestamp(start)]
+    if end:
+        df = df.loc[df["month"] <= pd.Timestamp(end)]
+    if last:
+        months = np.sort(df["month"].unique())[-last:]
+        df = df.loc[df["month"].isin(months)]
+    return df
+
+
+def query(
+    cube: pd.DataFrame,
+    filters: dict[str, list[str]] | None = None,
+    by: list[str] | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    last: int | None = None,
+) -> pd.DataFrame:
+    """Slice the cube by `filters` and roll the measures up to the `by` columns.
+
+    When grouped by month, adds arpa, avg_starting_mrr and nrr. NRR is taken over
+    the accounts in each group at month t (prior_mrr measure), not the group's
+    MRR at t-1, whose accounts can differ for time-varying dimensions.
+    """
+    by = list(by or ["month"])
+    cells = _slice(cube, filters)
+    if "month" not in by:
+        cells = _month_window(cells, start, end, last)
+    r = cells.groupby(by, as_index=False)[MEASURES].sum()
+
+    if "month" in by:
+        r["arpa"] = r["mrr"] / r["active_accounts"].replace(0, np.nan)
+        r["avg_starting_mrr"] = r["starting_mrr_sum"] / r["starting_mrr_accounts"].replace(0, np.nan)
+        prior = r["prior_mrr"].replace(0, np.nan)
+        r["nrr"] = (prior + r["expansion_mrr"] - r["contraction_mrr"] - r["churned_mrr"]) / prior
+        r = _month_window(r.sort_values(by).reset_index(drop=True), start, end, last)
+
+    return r.reset_index(drop=True)
+
+
+def contributions(
+    cube: pd.DataFrame,
+    filters: dict[str, list[str]] | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    last: int | None = None,
+) -> pd.DataFrame:
+    """Phase 3 driver comparison for a slice (the full cube reproduces phase3_driver_comparison)."""
+    r = query(cube, filters, by=["month"])
+
+    active = r.loc[r["active_accounts"] > 0]
+    monthly = pd.DataFrame({
+        "month": active["month"],
+        "net_revenue": active["mrr"],
+        "active_accounts": active["active_accounts"],
+        "arpa": active["arpa"],
+    })
+    monthly["mom_growth"] = monthly["net_revenue"].pct_change()
+    monthly["yoy_growth"] = monthly["net_revenue"].pct_change(12)
+
+    signed_up = r.loc[r["new_accounts"] > 0]
+    new_accounts = signed_up[["month", "new_accounts"]]
+    starting = signed_up[["month", "avg_starting_mrr"]]
+    bridge = active[["month", "expansion_mrr", "contraction_mrr", "churned_mrr"]]
+
+    out = compare_drivers(monthly, new_accounts, starting, bridge)
+    return _month_window(out, start, end, last).reset_index(drop=True)
+
+
+def load_cube() -> pd.DataFrame:
+    return read_table(CUBE_PATH)
+
+
+def _parse_filters(pairs: list[str]) -> dict[str, list[str]]:
+    filters: dict[str, list[str]] = {}
+    for pair in pairs:
+        dim, _, values = pair.partition("=")
+        filters.setdefault(dim, []).extend(v for v in values.split(",") if v)
+    return filters
+
+
+def _handler(cube: pd.DataFrame):
+    class CubeHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            params = {k: ",".join(v) for k, v in parse_qs(url.query).items()}
+            filters = {d: params[d].split(",") for d in DIMENSIONS if d in params}
+            try:
+                window = {
+                    "start": params.get("start"),
+                    "end": params.get("end"),
+                    "last": int(params["last"]) if "last" in params else None,
+                }
+                if url.path == "/query":
+                    by = params.get("by", "month").split(",")
+                    result = query(cube, filters, by=by, **window)
+                elif url.path == "/contributions":
+                    result = contributions(cube, filters, **window)
+                else:
+                    self.send_error(404, "Use /query or /contributions")
+                    return
+            except (ValueError, KeyError) as e:
+                self.send_error(400, str(e))
+                return
+
+            body = result.to_json(orient="records", date_format="iso").encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return CubeHandler
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("build", help="Build the cube from raw inputs.")
+
+    q = sub.add_parser("query", help="Slice and roll up the cube.")
+    q.add_argument("--filter", action="append", default=[], help="dimension=value[,value...] (repeatable)")
+    q.add_argument("--by", default="month", help="Comma-separated group-by columns (default: month).")
+    q.add_argument("--start", help="First month (YYYY-MM).")
+    q.add_argument("--end", help="Last month (YYYY-MM).")
+    q.add_argument("--last", type=int, help="Only the trailing N months.")
+    q.add_argument("--contributions", action="store_true", help="Return the phase 3 driver comparison for the slice.")
+
+    srv = sub.add_parser("serve", help="Serve /query and /contributions as JSON over HTTP.")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8050)
+
+    args = ap.parse_args()
+
+    if args.command == "build":
+        accounts, subs, churn = load_raw()
+        PROC.mkdir(parents=True, exist_ok=True)
+        cube = build_cube(accounts, subs, churn)
+        write_table(cube, CUBE_PATH)
+        print(f"Wrote {CUBE_PATH}: {len(cube)} cells")
+        return
+
+    cube = load_cube()
+
+    if args.command == "query":
+        filters = _parse_filters(args.filter)
+        window = {"start": args.start, "end": args.end, "last": args.last}
+        if args.contributions:
+            result = contributions(cube, filters, **window)
+        else:
+            result = query(cube, filters, by=args.by.split(","), **window)
+        print(result.to_string(index=False))
+        return
+
+    server = ThreadingHTTPServer((args.host, args.port), _handler(cube))
+    print(f"Serving revenue cube on http://{args.host}:{args.port} (/query, /contributions)")
+    print(json.dumps({"cells": len(cube), "dimensions": DIMENSIONS}))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
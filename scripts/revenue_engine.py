@@ -0,0 +1,130 @@
+"""Event-based (sweep-line) revenue series at day, week, month or quarter granularity.
+
+Each subscription becomes two events: +mrr in the period of its start_date and
+-mrr in the period after its end_date. A cumulative sum over the event totals
+gives active MRR per period without expanding intervals into rows, so daily and
+weekly series cost the same as monthly ones.
+
+Active accounts use the same sweep over per-account activity islands (runs of
+overlapping or adjacent subscriptions), so an account with concurrent
+subscriptions is counted once, matching the phase 1 `nunique` definition.
+
+At monthly granularity the output reproduces data/processed/monthly_net_revenue.csv.
+
+Usage:
+- python scripts/revenue_engine.py --granularity day
+- python scripts/revenue_engine.py --granularity week
+"""
+
+from __future__ import annotations
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from artifacts import write_table
+from paths import PROC
+from phase1_baseline import load_raw
+
+GRANULARITIES = {"day": "D", "week": "W", "month": "M", "quarter": "Q"}
+
+
+def _period_ordinals(s: pd.Series, freq: str) -> np.ndarray:
+    return s.dt.to_period(freq).array.asi8
+
+
+def _sweep(starts: np.ndarray, ends: np.ndarray, weights: np.ndarray, base: int, n: int) -> np.ndarray:
+    """Level per period for intervals [start, end] (inclusive ordinals) carrying `weights`."""
+    delta = np.bincount(starts - base, weights=weights, minlength=n + 1)
+    delta -= np.bincount(ends + 1 - base, weights=weights, minlength=n + 1)
+    return np.cumsum(delta[:n])
+
+
+def _account_islands(account: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Merge each account's overlapping or adjacent intervals into islands (vectorized)."""
+    order = np.lexsort((starts, account))
+    acc, st, en = account[order], starts[order], ends[order]
+
+    new_acc = np.ones(len(acc), dtype=bool)
+    new_acc[1:] = acc[1:] != acc[:-1]
+
+    # Running max end within each account; an island starts when the next interval
+    # begins after the running max end of everything before it.
+    run_end = pd.Series(en).groupby(np.cumsum(new_acc)).cummax().to_numpy()
+    new_island = new_acc.copy()
+    new_island[1:] |= st[1:] > run_end[:-1] + 1
+
+    island_id = np.cumsum(new_island) - 1
+    island_start = st[new_island]
+    island_end = np.zeros(island_id[-1] + 1 if len(island_id) else 0, dtype=en.dtype)
+    np.maximum.at(island_end, island_id, en)
+    return island_start, island_end
+
+
+def revenue_series(subs: pd.DataFrame, granularity: str = "month") -> pd.DataFrame:
+    """Active MRR, active accounts and ARPA per period from subscription events."""
+    freq = GRANULARITIES[granularity]
+    s = subs.dropna(subset=["account_id", "start_date", "end_date", "mrr_amount"])
+    if s.empty:
+        return pd.DataFrame(columns=["period", "net_revenue", "active_accounts", "arpa"])
+
+    starts = _period_ordinals(s["start_date"], freq)
+    ends = _period_ordinals(s["end_date"], freq)
+    # An interval ending before it starts contributes no periods (as in the row expansion).
+    keep = ends >= starts
+    s, starts, ends = s.loc[keep], starts[keep], ends[keep]
+    if s.empty:
+        return pd.DataFrame(columns=["period", "net_revenue", "active_accounts", "arpa"])
+    base = int(starts.min())
+    n = int(max(ends.max(), starts.max())) - base + 1
+
+    net_revenue = _sweep(starts, ends, s["mrr_amount"].to_numpy(dtype=float), base, n)
+
+    account_codes = pd.factorize(s["account_id"])[0]
+    isl_start, isl_end = _account_islands(account_codes, starts, ends)
+    active_accounts = _sweep(isl_start, isl_end, np.ones(len(isl_start)), base, n)
+
+    periods = pd.period_range(start=pd.Period(ordinal=base, freq=freq), periods=n, freq=freq)
+    out = pd.DataFrame({
+        "period": periods.to_timestamp(),
+        "net_revenue": net_revenue,
+        "active_accounts": np.rint(active_accounts).astype("int64"),
+    })
+    # Keep only periods with activity (the row-expansion path has no rows otherwise).
+    out = out.loc[out["active_accounts"] > 0].reset_index(drop=True)
+    out["arpa"] = out["net_revenue"] / out["active_accounts"]
+    return out
+
+
+def monthly_net_revenue(subs: pd.DataFrame) -> pd.DataFrame:
+    """Sweep-line equivalent of phase1 compute_monthly_net_revenue (same columns)."""
+    m = revenue_series(subs, "month").rename(columns={"period": "month"})
+    m["mom_growth"] = m["net_revenue"].pct_change()
+    m["yoy_growth"] = m["net_revenue"].pct_change(12)
+    return m
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--granularity", choices=sorted(GRANULARITIES), default="month")
+    args = ap.parse_args()
+
+    PROC.mkdir(parents=True, exist_ok=True)
+    _, subs, _ = load_raw()
+
+    if args.granularity == "month":
+        series = monthly_net_revenue(subs)
+    else:
+        series = revenue_series(subs, args.granularity)
+        series["period_growth"] = series["net_revenue"].pct_change()
+
+    out_path = PROC / f"revenue_series_{args.granularity}.csv"
+    write_table(series, out_path)
+
+    print(f"Wrote {out_path}")
+    print("Periods:", len(series), "from", series.iloc[0, 0], "to", series.iloc[-1, 0])
+
+
+if __name__ == "__main__":
+    main()
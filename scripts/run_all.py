@@ -3,9 +3,12 @@
 This is a convenience entrypoint for reviewers.
 
 Default mode runs in the current working tree.
-Safe-test mode (--safe-test) runs the pipeline inside a temporary copy of the repo,
-optionally seeding it with any existing local raw data, so it can't overwrite
-your committed artifacts.
+Safe-test mode (--safe-test) runs the pipeline in the current interpreter against
+the existing raw inputs (read in place, never written) with every output under a
+temporary output root, so it can't overwrite your committed artifacts.
+
+Input and output locations can be overridden with flags or the PIPELINE_* environment
+variables documented in scripts/paths.py.
 
 Prereqs:
 - Python 3.11+ (tested on 3.12)
@@ -15,6 +18,11 @@ Prereqs:
 Usage:
 - python scripts/run_all.py
 - python scripts/run_all.py --safe-test
+- python scripts/run_all.py --artifact-format both  # CSV + memory-mappable Arrow IPC copies
+- python scripts/run_all.py --raw-dir /data/export --output-root /tmp/run1
+- python scripts/run_all.py --simulate  # what-if payoff per driver, cited in the recommendation
+- python scripts/run_all.py --start-month 2024-01 --end-month 2025-12  # loads only what the window needs
+- python scripts/run_all.py --partitions 8  # phases 1 and 2B on 8 account_id shards
 
 Outputs:
 - data/processed/*.csv
@@ -34,113 +42,98 @@ from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
 
-
-def run(cmd: list[str], cwd: Path) -> None:
+# Flag -> environment variable read by scripts/paths.py in every phase.
+PATH_FLAGS = {
+    "raw_dir": "PIPELINE_RAW_DIR",
+    "output_root": "PIPELINE_OUTPUT_ROOT",
+    "processed_dir": "PIPELINE_PROCESSED_DIR",
+    "figures_dir": "PIPELINE_FIGURES_DIR",
+    "recommendation_path": "PIPELINE_RECOMMENDATION_PATH",
+}
+
+# Pipeline steps in order: data (idempotent; if raw data exists it will just write hashes),
+# phase 1 baseline (also writes the ingest validation report), phase 2 hypotheses, phase 3 comparison,
+# phase 4 recommendation.
+PIPELINE_STEPS = [
+    "scripts/download_data.py",
+    "scripts/phase1_baseline.py",
+    "scripts/phase2a_acquisition_output.py",
+    "scripts/phase2b_ltv_deterioration.py",
+    "scripts/phase2c_pricing_proxies.py",
+    "scripts/phase3_compare_drivers.py",
+    "scripts/phase4_recommendation.py",
+]
+
+# Optional step (PIPELINE_SIMULATE=1 / --simulate): scenario simulation that phase 4 cites.
+SIMULATION_STEP = "scripts/simulate_scenarios.py"
+
+
+def pipeline_steps(env: dict[str, str] | None = None) -> list[str]:
+    env = os.environ if env is None else env
+    steps = list(PIPELINE_STEPS)
+    if env.get("PIPELINE_SIMULATE", "").lower() in ("1", "true", "yes"):
+        steps.insert(steps.index("scripts/phase4_recommendation.py"), SIMULATION_STEP)
+    return steps
+
+
+def run(cmd: list[str], cwd: Path, env: dict[str, str] | None = None) -> None:
     print("\n$", " ".join(cmd))
-    subprocess.check_call(cmd, cwd=str(cwd))
-
-
-def run_pipeline(cwd: Path) -> None:
-    # Data (idempotent; if raw data exists it will just write hashes)
-    run([sys.executable, "scripts/download_data.py"], cwd)
-
-    # Phase 1
-    run([sys.executable, "scripts/phase1_baseline.py"], cwd)
-
-    # Phase 2 hypotheses
-    run([sys.executable, "scripts/phase2a_acquisition_output.py"], cwd)
-    run([sys.executable, "scripts/phase2b_ltv_deterioration.py"], cwd)
-    run([sys.executable, "scripts/phase2c_pricing_proxies.py"], cwd)
+    subprocess.check_call(cmd, cwd=str(cwd), env=env)
 
-    # Phase 3 comparison
-    run([sys.executable, "scripts/phase3_compare_drivers.py"], cwd)
 
-    # Phase 4 recommendation
-    run([sys.executable, "scripts/phase4_recommendation.py"], cwd)
+def run_pipeline(cwd: Path, env: dict[str, str] | None = None) -> None:
+    for step in pipeline_steps(env):
+        run([sys.executable, step], cwd, env)
 
 
 def safe_test() -> int:
-    """Run the pipeline inside a temp copy of the repo.
+    """Run the pipeline with all outputs redirected to a temporary output root.
 
-    This avoids overwriting any local outputs in your current working tree.
-    It also reduces Kaggle dependence by copying any existing local raw data
-    into the temp copy when available.
+    Raw inputs are read in place from the configured raw dir; nothing is copied and
+    no venv is built, so an isolated run costs about the same as a normal run.
+    If raw data is absent it is downloaded into the temp root instead.
     """
+    # Imported here so paths reflect any flags main() has already put in the environment.
+    from download_data import EXPECTED_FILES
+    from paths import RAW
+
     with tempfile.TemporaryDirectory(prefix="runall_safe_test_") as td:
         troot = Path(td)
 
-        # Export a clean copy of the repo at HEAD (no .git dir)
-        archive_cmd = ["git", "archive", "--format=tar", "HEAD"]
-        tar_path = troot / "repo.tar"
-        with tar_path.open("wb") as f:
-            subprocess.check_call(archive_cmd, cwd=str(ROOT), stdout=f)
-        run(["tar", "-xf", str(tar_path), "-C", str(troot)], troot)
-        tar_path.unlink(missing_ok=True)
-
-        # Seed raw data if present locally
-        src_raw = ROOT / "data" / "raw" / "ravenstack"
-        dst_raw = troot / "data" / "raw" / "ravenstack"
-        if src_raw.exists():
-            dst_raw.mkdir(parents=True, exist_ok=True)
-            for p in src_raw.glob("*.csv"):
-                shutil.copy2(p, dst_raw / p.name)
-
-        # Create venv + install requirements inside temp
-        run([sys.executable, "-m", "venv", ".venv"], troot)
-        pip = troot / ".venv" / "bin" / "pip"
-        py = troot / ".venv" / "bin" / "python"
-        run([str(pip), "install", "-r", "requirements.txt"], troot)
-
-        # Execute pipeline using temp venv python
         env = os.environ.copy()
         env["PYTHONUNBUFFERED"] = "1"
-
-        def run_env(cmd: list[str]) -> None:
-            print("\n$", " ".join(cmd))
-            subprocess.check_call(cmd, cwd=str(troot), env=env)
-
-        # Data + phases
-        # In safe-test mode, avoid surprising failures due to Kaggle CLI setup.
-        # If raw CSVs are present (seeded from the current working tree), skip the Kaggle download call.
-        raw_dir = troot / "data" / "raw" / "ravenstack"
-        expected = [
-            "ravenstack_accounts.csv",
-            "ravenstack_subscriptions.csv",
-            "ravenstack_churn_events.csv",
-            "ravenstack_feature_usage.csv",
-            "ravenstack_support_tickets.csv",
-        ]
-        have_raw = raw_dir.exists() and all((raw_dir / f).exists() for f in expected)
+        # Every output derives from the temp root; drop per-output overrides.
+        for var in PATH_FLAGS.values():
+            if var != "PIPELINE_RAW_DIR":
+                env.pop(var, None)
+        env.pop("PIPELINE_HASHES_FILE", None)
+        env["PIPELINE_OUTPUT_ROOT"] = str(troot)
+
+        have_raw = all((RAW / f).exists() for f in EXPECTED_FILES)
         if have_raw:
-            print('\nRaw data present in temp copy; skipping Kaggle download step.')
+            print(f"\nRaw data present in {RAW}; reading it in place.")
         else:
-            # Attempt download only if Kaggle CLI is available; otherwise fail with a clear message.
-            kaggle_ok = shutil.which('kaggle') is not None
-            if not kaggle_ok:
+            # Download only if a source is available; otherwise fail with a clear message.
+            if shutil.which("kaggle") is None and not env.get("RAVENSTACK_MIRROR"):
                 raise RuntimeError(
-                    'Safe-test requires either (a) existing raw CSVs in data/raw/ravenstack/ '
-                    'or (b) Kaggle CLI configured. Kaggle CLI not found.'
+                    f"Safe-test requires either (a) existing raw CSVs in {RAW} "
+                    "or (b) Kaggle CLI configured or RAVENSTACK_MIRROR set. Neither found."
                 )
-            run_env([str(py), 'scripts/download_data.py'])
+            env["PIPELINE_RAW_DIR"] = str(troot / "data" / "raw" / "ravenstack")
 
-        run_env([str(py), "scripts/phase1_baseline.py"])
-        run_env([str(py), "scripts/phase2a_acquisition_output.py"])
-        run_env([str(py), "scripts/phase2b_ltv_deterioration.py"])
-        run_env([str(py), "scripts/phase2c_pricing_proxies.py"])
-        run_env([str(py), "scripts/phase3_compare_drivers.py"])
-        run_env([str(py), "scripts/phase4_recommendation.py"])
+        run_pipeline(ROOT, env)
+        run([sys.executable, "scripts/verify_outputs.py"], ROOT, env)
 
         # Quick success signal
         must_exist = [
             troot / "analysis_recommendation.md",
-            troot / "data" / "processed" / "monthly_net_revenue.csv",
             troot / "data" / "processed" / "phase3_driver_comparison.csv",
         ]
-        missing = [str(p) for p in must_exist if not p.exists()]
+        missing = [str(p) for p in must_exist if not p.exists() and not p.with_suffix(".arrow").exists()]
         if missing:
             raise RuntimeError("Safe-test completed but expected outputs missing: " + ", ".join(missing))
 
-        print("\nSAFE-TEST OK (ran in temp copy):", troot)
+        print("\nSAFE-TEST OK (outputs in temp root):", troot)
 
     return 0
 
@@ -150,20 +143,73 @@ def main() -> int:
     ap.add_argument(
         "--safe-test",
         action="store_true",
-        help="Run inside a temporary repo copy so existing local outputs are not overwritten.",
+        help="Write all outputs to a temporary root so existing local outputs are not overwritten.",
+    )
+    ap.add_argument(
+        "--artifact-format",
+        choices=["csv", "both", "arrow"],
+        help="Processed artifact format (sets PIPELINE_ARTIFACT_FORMAT for every phase).",
+    )
+    ap.add_argument(
+        "--approx",
+        action="store_true",
+        help="Use mergeable sketches for distinct counts and medians (sets PIPELINE_APPROX_AGG=1).",
+    )
+    ap.add_argument(
+        "--partitions",
+        type=int,
+        help="Hash-partition phases 1 and 2B by account_id across N worker processes (sets PIPELINE_PARTITIONS).",
+    )
+    ap.add_argument(
+        "--simulate",
+        action="store_true",
+        help="Run the Monte Carlo scenario simulation before phase 4 so it cites the payoff (sets PIPELINE_SIMULATE=1).",
+    )
+    ap.add_argument(
+        "--strict-ingest",
+        action="store_true",
+        help="Drop rows quarantined by ingest validation when phases load raw data (sets PIPELINE_STRICT_INGEST=1).",
     )
+    ap.add_argument("--start-month", help="First month of a time-range run, e.g. 2024-01 (env: PIPELINE_START_MONTH).")
+    ap.add_argument("--end-month", help="Last month of a time-range run, e.g. 2025-12 (env: PIPELINE_END_MONTH).")
+    ap.add_argument("--raw-dir", help="Raw ravenstack_*.csv directory (env: PIPELINE_RAW_DIR).")
+    ap.add_argument("--output-root", help="Base directory for all outputs (env: PIPELINE_OUTPUT_ROOT).")
+    ap.add_argument("--processed-dir", help="Processed tables directory (env: PIPELINE_PROCESSED_DIR).")
+    ap.add_argument("--figures-dir", help="Figures directory (env: PIPELINE_FIGURES_DIR).")
+    ap.add_argument("--recommendation-path", help="Recommendation markdown path (env: PIPELINE_RECOMMENDATION_PATH).")
     args = ap.parse_args()
 
+    if args.artifact_format:
+        os.environ["PIPELINE_ARTIFACT_FORMAT"] = args.artifact_format
+    if args.approx:
+        os.environ["PIPELINE_APPROX_AGG"] = "1"
+    if args.start_month:
+        os.environ["PIPELINE_START_MONTH"] = args.start_month
+    if args.end_month:
+        os.environ["PIPELINE_END_MONTH"] = args.end_month
+    if args.strict_ingest:
+        os.environ["PIPELINE_STRICT_INGEST"] = "1"
+    if args.simulate:
+        os.environ["PIPELINE_SIMULATE"] = "1"
+    if args.partitions:
+        os.environ["PIPELINE_PARTITIONS"] = str(args.partitions)
+    for flag, var in PATH_FLAGS.items():
+        value = getattr(args, flag)
+        if value:
+            os.environ[var] = str(Path(value).resolve())
+
     if args.safe_test:
         return safe_test()
 
     run_pipeline(ROOT)
 
+    from paths import FIGURES, PROC, RECOMMENDATION
+
     print("\nDone.")
     print("Key outputs:")
-    print("- analysis_recommendation.md")
-    print("- data/processed/")
-    print("- docs/figures/")
+    print(f"- {RECOMMENDATION}")
+    print(f"- {PROC}/")
+    print(f"- {FIGURES}/")
     return 0
 
 
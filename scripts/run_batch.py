@@ -0,0 +1,150 @@
+"""Run the full pipeline for many tenants (one raw export directory each) in parallel.
+
+Each input directory must hold the ravenstack_*.csv files. Every tenant gets its
+own output root under --output-root/<tenant>, and its phases run as a separate
+process chain, so throughput scales with the number of workers (default: one
+per core). Raw directories are only read.
+
+After all tenants finish, a consolidated summary is written to the batch root:
+- batch_summary.csv: latest leader_pressure_3m, streak and recommendation per tenant.
+- batch_backtest.csv: the phase 4 verdict for every tenant and month.
+
+Usage:
+- python scripts/run_batch.py /exports/bu_emea /exports/bu_apac --output-root /tmp/batch
+- python scripts/run_batch.py --tenants-file tenants.txt --output-root /tmp/batch --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from artifacts import read_table, write_table
+from download_data import EXPECTED_FILES
+from phase4_recommendation import backtest
+from run_all import ROOT, pipeline_steps
+
+
+def tenant_names(raw_dirs: list[Path]) -> list[str]:
+    """Tenant name per input dir: the directory name, suffixed if it repeats.
+
+    Suffixes skip every name already taken, including directory names that come
+    later in the list, so names (and output roots) are always unique.
+    """
+    taken = {d.name for d in raw_dirs}
+    first_seen: set[str] = set()
+    names: list[str] = []
+    for d in raw_dirs:
+        if d.name not in first_seen:
+            first_seen.add(d.name)
+            names.append(d.name)
+            continue
+        k = 2
+        while f"{d.name}_{k}" in taken:
+            k += 1
+        taken.add(f"{d.name}_{k}")
+        names.append(f"{d.name}_{k}")
+    return names
+
+
+def run_tenant(name: str, raw_dir: Path, out_root: Path) -> dict:
+    """Run every pipeline step for one tenant; output and errors go to <out_root>/pipeline.log."""
+    missing = [f for f in EXPECTED_FILES if not (raw_dir / f).exists()]
+    if missing:
+        return {"tenant": name, "status": "failed", "error": f"missing raw files: {', '.join(missing)}"}
+
+    out_root.mkdir(parents=True, exist_ok=True)
+    env = os.environ.copy()
+    for var in ("PIPELINE_PROCESSED_DIR", "PIPELINE_FIGURES_DIR", "PIPELINE_RECOMMENDATION_PATH", "PIPELINE_HASHES_FILE"):
+        env.pop(var, None)
+    env["PIPELINE_RAW_DIR"] = str(raw_dir)
+    env["PIPELINE_OUTPUT_ROOT"] = str(out_root)
+    env["PYTHONUNBUFFERED"] = "1"
+
+    started = time.perf_counter()
+    with (out_root / "pipeline.log").open("w", encoding="utf-8") as log:
+        for step in pipeline_steps(env):
+            log.write(f"\n$ {sys.executable} {step}\n")
+            log.flush()
+            rc = subprocess.call([sys.executable, step], cwd=str(ROOT), env=env, stdout=log, stderr=subprocess.STDOUT)
+            if rc != 0:
+                return {"tenant": name, "status": "failed", "error": f"{step} exited with {rc}"}
+
+    return {"tenant": name, "status": "ok", "seconds": round(time.perf_counter() - started, 2)}
+
+
+def summarize(results: list[dict], out_roots: dict[str, Path]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Cross-tenant summary of the latest pressure leader and recommendation, plus the full backtest."""
+    comps = []
+    for r in results:
+        if r["status"] != "ok":
+            continue
+        comp = read_table(out_roots[r["tenant"]] / "data" / "processed" / "phase3_driver_comparison.csv")
+        comp.insert(0, "tenant", r["tenant"])
+        comps.append(comp)
+
+    runs = pd.DataFrame(results)
+    if not comps:
+        return runs, pd.DataFrame()
+
+    comp = pd.concat(comps, ignore_index=True)
+    bt = backtest(comp, by=["tenant"])
+
+    latest = bt.loc[bt["leader_pressure_3m"].notna()].groupby("tenant").tail(1)
+    revenue = comp.groupby("tenant").tail(1)[["tenant", "net_revenue"]]
+    summary = runs.merge(
+        latest[["tenant", "month", "leader_pressure_3m", "pressure_streak", "recommendation_mode", "recommendation_driver"]],
+        on="tenant",
+        how="left",
+    ).merge(revenue.rename(columns={"net_revenue": "latest_net_revenue"}), on="tenant", how="left")
+    return summary, bt
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("raw_dirs", nargs="*", type=Path, help="Raw export directories, one per tenant.")
+    ap.add_argument("--tenants-file", type=Path, help="File with one raw export directory per line.")
+    ap.add_argument("--output-root", type=Path, required=True, help="Batch root; each tenant writes to <root>/<tenant>.")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Tenants run concurrently (default: cores).")
+    args = ap.parse_args()
+
+    raw_dirs = list(args.raw_dirs)
+    if args.tenants_file:
+        lines = args.tenants_file.read_text(encoding="utf-8").splitlines()
+        raw_dirs += [Path(line.strip()) for line in lines if line.strip() and not line.startswith("#")]
+    if not raw_dirs:
+        raise SystemExit("No tenant directories given")
+
+    # Name tenants from the paths as given (normalized, symlinks kept), then resolve.
+    names = tenant_names([Path(os.path.abspath(d)) for d in raw_dirs])
+    raw_dirs = [d.resolve() for d in raw_dirs]
+    batch_root = args.output_root.resolve()
+    out_roots = {n: batch_root / n for n in names}
+
+    print(f"Running {len(names)} tenants with {args.workers} workers -> {batch_root}")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(run_tenant, names, raw_dirs, [out_roots[n] for n in names]))
+    elapsed = time.perf_counter() - started
+
+    summary, bt = summarize(results, out_roots)
+    batch_root.mkdir(parents=True, exist_ok=True)
+    write_table(summary, batch_root / "batch_summary.csv")
+    if not bt.empty:
+        write_table(bt, batch_root / "batch_backtest.csv")
+
+    print(summary.to_string(index=False))
+    failed = int((summary["status"] != "ok").sum())
+    print(f"\n{len(names) - failed}/{len(names)} tenants OK in {elapsed:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,212 @@
+"""Monte Carlo what-if simulation of next-quarter net revenue under driver interventions.
+
+Monthly rates are fitted from the phase 2 outputs over the trailing FIT_MONTHS:
+- retention (hypB): MRR churn, expansion and contraction as shares of prior start MRR,
+  and logo churn as churned accounts over prior active accounts.
+- acquisition (hypA): new accounts per month and their average starting MRR.
+- pricing (hypC): ARPA and active accounts, which set the starting book.
+
+Each path steps the book forward month by month:
+    mrr[t] = mrr[t-1] * (1 - churn + expansion - contraction + other) + new_accounts * starting_mrr
+    accounts[t] = accounts[t-1] * (1 - logo_churn) + new_accounts
+where `other` is the historical residual of this identity (reactivations, timing), so the
+baseline reproduces the fitted months. Every path draws whole historical months with
+replacement, which keeps the rates of one month together. Scenarios scale a lever by a
+percentage ("churn -10%", "starting_mrr +5%"); all scenarios share the same draws, so
+uplift versus baseline is a paired difference.
+
+Levers: churn, expansion, contraction (retention); new_accounts, starting_mrr (acquisition);
+arpa (pricing: scales the existing book and starting MRR).
+
+Output: data/processed/scenario_simulation.csv, one row per scenario with the distribution
+of next-quarter net revenue (sum of the next HORIZON_MONTHS months) and of the uplift.
+Phase 4 cites it when its as_of_month matches the latest comparison month.
+
+Usage:
+- python scripts/simulate_scenarios.py
+- python scripts/simulate_scenarios.py --scenario "churn -10%" --scenario "starting MRR +5%" --paths 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+
+from artifacts import read_table, write_table
+from paths import PROC
+
+PROC.mkdir(parents=True, exist_ok=True)
+
+FIT_MONTHS = 12
+HORIZON_MONTHS = 3
+DEFAULT_PATHS = 100_000
+DEFAULT_SEED = 0
+
+LEVER_DRIVER = {
+    "churn": "retention",
+    "expansion": "retention",
+    "contraction": "retention",
+    "new_accounts": "acquisition",
+    "starting_mrr": "acquisition",
+    "arpa": "pricing",
+}
+
+DEFAULT_SCENARIOS = [
+    "churn -10%",
+    "contraction -10%",
+    "expansion +10%",
+    "new_accounts +10%",
+    "starting_mrr +5%",
+    "arpa +3%",
+]
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+SIM_PATH = PROC / "scenario_simulation.csv"
+
+
+def parse_scenario(spec: str) -> tuple[str, float]:
+    """'churn -10%' -> ('churn', -0.10); lever names are case/space-insensitive."""
+    m = re.fullmatch(r"\s*([A-Za-z_ ]+?)\s*([+-]\d+(?:\.\d+)?)\s*%\s*", spec)
+    if not m:
+        raise SystemExit(f"Bad scenario {spec!r}; expected e.g. 'churn -10%'")
+    lever = re.sub(r"\s+", "_", m.group(1).strip().lower())
+    if lever not in LEVER_DRIVER:
+        raise SystemExit(f"Unknown lever {lever!r}; choose from: {', '.join(LEVER_DRIVER)}")
+    return lever, float(m.group(2)) / 100
+
+
+def fit_rates(
+    bridge: pd.DataFrame,
+    churn_overall: pd.DataFrame,
+    new_accounts: pd.DataFrame,
+    starting: pd.DataFrame,
+    arpa: pd.DataFrame,
+    fit_months: int = FIT_MONTHS,
+) -> pd.DataFrame:
+    """One row of monthly rates per fitted month (the trailing `fit_months` with a prior book)."""
+    df = (
+        arpa[["month", "net_revenue", "active_accounts"]]
+        .merge(bridge[["month", "expansion_mrr", "contraction_mrr", "churned_mrr", "prior_start_mrr"]], on="month", how="left")
+        .merge(churn_overall[["month", "churned_accounts"]], on="month", how="left")
+        .merge(new_accounts, on="month", how="left")
+        .merge(starting[["month", "avg_starting_mrr"]], on="month", how="left")
+        .sort_values("month")
+    )
+    df[["churned_mrr", "churned_accounts", "new_accounts", "avg_starting_mrr"]] = df[
+        ["churned_mrr", "churned_accounts", "new_accounts", "avg_starting_mrr"]
+    ].fillna(0)
+
+    prior_mrr = df["net_revenue"].shift(1)
+    prior_accounts = df["active_accounts"].shift(1)
+    rates = pd.DataFrame({"month": df["month"]})
+    rates["churn"] = df["churned_mrr"] / prior_mrr
+    rates["expansion"] = df["expansion_mrr"] / prior_mrr
+    rates["contraction"] = df["contraction_mrr"] / prior_mrr
+    rates["logo_churn"] = df["churned_accounts"] / prior_accounts
+    rates["new_accounts"] = df["new_accounts"]
+    rates["starting_mrr"] = df["avg_starting_mrr"]
+
+    explained = prior_mrr * (1 - rates["churn"] + rates["expansion"] - rates["contraction"]) + rates["new_accounts"] * rates["starting_mrr"]
+    rates["other"] = (df["net_revenue"] - explained) / prior_mrr
+
+    rates = rates.loc[(prior_mrr > 0) & (prior_accounts > 0)].dropna()
+    if rates.empty:
+        raise SystemExit("Not enough history to fit simulation rates")
+    return rates.tail(fit_months).reset_index(drop=True)
+
+
+def simulate(
+    rates: pd.DataFrame,
+    start_mrr: float,
+    start_accounts: float,
+    scenarios: list[str],
+    paths: int = DEFAULT_PATHS,
+    horizon: int = HORIZON_MONTHS,
+    seed: int = DEFAULT_SEED,
+) -> pd.DataFrame:
+    """Distribution of next-quarter net revenue per scenario (baseline first)."""
+    rng = np.random.default_rng(seed)
+    draw = rng.integers(0, len(rates), size=(horizon, paths))
+    r = {c: rates[c].to_numpy(dtype=float)[draw] for c in rates.columns if c != "month"}
+
+    outcomes = {}
+    for spec in ["baseline"] + scenarios:
+        lever, change = ("", 0.0) if spec == "baseline" else parse_scenario(spec)
+        scale = {lever: 1 + change} if lever else {}
+        if lever == "churn":
+            scale["logo_churn"] = 1 + change
+        arpa = scale.pop("arpa", 1.0)
+
+        mrr = np.full(paths, start_mrr * arpa)
+        accounts = np.full(paths, float(start_accounts))
+        quarter = np.zeros(paths)
+        for t in range(horizon):
+            retained = 1 - r["churn"][t] * scale.get("churn", 1) + r["expansion"][t] * scale.get("expansion", 1)
+            retained -= r["contraction"][t] * scale.get("contraction", 1)
+            new = r["new_accounts"][t] * scale.get("new_accounts", 1)
+            mrr = mrr * (retained + r["other"][t]) + new * r["starting_mrr"][t] * scale.get("starting_mrr", 1) * arpa
+            accounts = accounts * (1 - r["logo_churn"][t] * scale.get("logo_churn", 1)) + new
+            quarter += mrr
+        outcomes[spec] = (lever, change, quarter, mrr / np.maximum(accounts, 1))
+
+    base = outcomes["baseline"][2]
+    rows = []
+    for spec, (lever, change, quarter, exit_arpa) in outcomes.items():
+        uplift = quarter - base
+        row = {
+            "scenario": spec,
+            "driver": LEVER_DRIVER.get(lever),
+            "lever": lever or None,
+            "change_pct": change * 100,
+            "paths": paths,
+            "horizon_months": horizon,
+            "mean": quarter.mean(),
+        }
+        row.update({f"p{round(q * 100):02d}": v for q, v in zip(QUANTILES, np.quantile(quarter, QUANTILES))})
+        row["uplift_mean"] = uplift.mean()
+        row.update({f"uplift_p{round(q * 100):02d}": v for q, v in zip([0.05, 0.5, 0.95], np.quantile(uplift, [0.05, 0.5, 0.95]))})
+        row["prob_uplift_positive"] = float((uplift > 0).mean()) if lever else np.nan
+        row["exit_arpa_p50"] = float(np.median(exit_arpa))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scenario", action="append", help="Lever change such as 'churn -10%%' (repeatable; default: a standard set).")
+    ap.add_argument("--paths", type=int, default=DEFAULT_PATHS, help="Simulation paths per scenario.")
+    ap.add_argument("--fit-months", type=int, default=FIT_MONTHS, help="Trailing months used to fit rates.")
+    ap.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = ap.parse_args()
+
+    scenarios = args.scenario or DEFAULT_SCENARIOS
+    for spec in scenarios:
+        parse_scenario(spec)
+
+    arpa = read_table(PROC / "hypC_arpa_drift.csv")
+    rates = fit_rates(
+        read_table(PROC / "hypB_revenue_bridge_components.csv"),
+        read_table(PROC / "hypB_churn_rate_overall.csv"),
+        read_table(PROC / "hypA_new_accounts_per_month.csv"),
+        read_table(PROC / "hypA_starting_mrr_trend.csv"),
+        arpa,
+        args.fit_months,
+    )
+
+    latest = arpa.sort_values("month").iloc[-1]
+    sim = simulate(rates, float(latest["net_revenue"]), float(latest["active_accounts"]), scenarios, args.paths, seed=args.seed)
+    sim.insert(0, "as_of_month", latest["month"])
+    sim["fit_months"] = len(rates)
+
+    write_table(sim, SIM_PATH)
+
+    print(f"Fitted {len(rates)} months ({rates['month'].min():%b %Y} to {rates['month'].max():%b %Y}); {args.paths} paths per scenario")
+    print(sim[["scenario", "p05", "p50", "p95", "uplift_p50", "prob_uplift_positive"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
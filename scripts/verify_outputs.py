@@ -15,10 +15,8 @@ from __future__ import annotations
 
 from pathlib import Path
 
-import pandas as pd
-
-ROOT = Path(__file__).resolve().parents[1]
-PROC = ROOT / "data" / "processed"
+from artifacts import read_table, table_exists
+from paths import HASHES_FILE, PROC, RECOMMENDATION
 
 
 def must_exist(path: Path) -> None:
@@ -29,8 +27,8 @@ def must_exist(path: Path) -> None:
 
 
 def main() -> None:
-    must_exist(ROOT / "analysis_recommendation.md")
-    must_exist(ROOT / "data" / "hashes.sha256")
+    must_exist(RECOMMENDATION)
+    must_exist(HASHES_FILE)
 
     expected_processed = [
         "monthly_net_revenue.csv",
@@ -47,10 +45,12 @@ def main() -> None:
         "phase3_driver_comparison.csv",
     ]
 
+    # Processed tables may be CSV, Arrow IPC, or both (PIPELINE_ARTIFACT_FORMAT).
     for f in expected_processed:
-        must_exist(PROC / f)
+        if not table_exists(PROC / f):
+            raise SystemExit(f"Missing expected file: {PROC / f}")
 
-    comp = pd.read_csv(PROC / "phase3_driver_comparison.csv")
+    comp = read_table(PROC / "phase3_driver_comparison.csv")
     required_cols = {
         "month",
         "leader_lever_3m",
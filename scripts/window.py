@@ -0,0 +1,98 @@
+"""Month window for time-range runs (PIPELINE_START_MONTH / PIPELINE_END_MONTH).
+
+run_all.py --start-month / --end-month set these for every phase. Raw loading
+(ingest.read_raw) pushes the window down: subscriptions that end before the first
+loaded month or start after the end month, and accounts and churn events dated
+after the end month, are dropped chunk by chunk as the exports are read, so the
+rest of history is never held in memory or expanded to account-months.
+
+The first loaded month is LOOKBACK_MONTHS before the start month. That history
+covers the calendar lags downstream: prior active accounts and prior start MRR
+(1 month), driver contributions (diff) summed over rolling 3-month windows
+(4 months) and YoY growth (12 months).
+
+Two account-level inputs are not calendar lags, so raw loading carries one
+extra month per account for each:
+- Phase 2B's prior MRR is the account's previous observed month, which can lie
+  any distance back (reactivations after a long gap). Raw loading keeps the
+  subscriptions ending in the account's last month before the first loaded month.
+- Phase 2A's starting MRR is the account's first observed month, which for a
+  signup inside the window can lie after the end month (a late first
+  subscription, or an earlier one without an end date). Raw loading keeps the
+  subscriptions starting in that month.
+account_month_mrr.csv carries both months (clip_account_months); month-level
+tables are clipped to the loaded months.
+
+Processed tables cover the lookback months too; their rows from the start month
+on equal those of a full run. The lookback rows themselves are warm-up and may
+differ from a full run.
+
+There are two exceptions. Phase 4's pressure_streak counts consecutive months
+without limit: a run that began before the loaded months is counted from the
+first months with full history. The recommendation verdict only needs the last
+MIN_STREAK months and is unaffected. The ingest report (ingest_quarantine,
+ingest_dq_summary) only covers the loaded rows.
+"""
+
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+
+START_ENV = "PIPELINE_START_MONTH"
+END_ENV = "PIPELINE_END_MONTH"
+
+LOOKBACK_MONTHS = 12
+
+
+def _month(var: str) -> pd.Timestamp | None:
+    value = os.environ.get(var)
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value).to_period("M").to_timestamp()
+    except ValueError:
+        raise SystemExit(f"{var} must be a month such as 2024-01, got {value!r}") from None
+
+
+def month_window() -> tuple[pd.Timestamp | None, pd.Timestamp | None]:
+    """(first loaded month, end month); None for an open side."""
+    start, end = _month(START_ENV), _month(END_ENV)
+    if start is not None and end is not None and start > end:
+        raise SystemExit(f"{START_ENV} ({start:%Y-%m}) is after {END_ENV} ({end:%Y-%m})")
+    first = start - pd.DateOffset(months=LOOKBACK_MONTHS) if start is not None else None
+    return first, end
+
+
+def window_active() -> bool:
+    return month_window() != (None, None)
+
+
+def clip_months(df: pd.DataFrame, col: str = "month") -> pd.DataFrame:
+    """Rows whose month lies in the loaded window (all rows when no window is set)."""
+    first, end = month_window()
+    if first is None and end is None:
+        return df
+    keep = pd.Series(True, index=df.index)
+    if first is not None:
+        keep &= df[col] >= first
+    if end is not None:
+        keep &= df[col] <= end
+    return df.loc[keep]
+
+
+def clip_account_months(am: pd.DataFrame) -> pd.DataFrame:
+    """Account-months in the loaded window, plus each account's last month before it
+    and its first observed month if that falls after the window."""
+    first, end = month_window()
+    if first is None and end is None:
+        return am
+    parts = [clip_months(am)]
+    if first is not None:
+        before = am.loc[am["month"] < first]
+        parts.append(before.loc[before.groupby("account_id")["month"].transform("max").eq(before["month"])])
+    if end is not None:
+        first_seen = am.groupby("account_id")["month"].transform("min").eq(am["month"])
+        parts.append(am.loc[first_seen & (am["month"] > end)])
+    return pd.concat(parts).sort_values(["month", "account_id"])